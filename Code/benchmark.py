@@ -0,0 +1,358 @@
+"""
+Benchmarks for the engine core.
+
+Usage:
+    python benchmark.py [BENCHMARK ...] [--record]
+
+Runs all benchmarks if none is given. The signatures benchmark compares the search
+signatures with the ones recorded in SIGNATURES_FILE (recording them with --record).
+"""
+
+import argparse
+import hashlib
+import json
+from math import inf
+import os
+import random
+import subprocess
+import sys
+import time
+import tracemalloc
+
+from impasse import BACKEND
+from impasse.ai import AI
+from impasse.constants import *
+from impasse.game_records import move_to_string
+from impasse.position import Position
+from impasse.transposition_table import ENTRY
+
+SIGNATURES_FILE = os.path.join(os.path.dirname(__file__), "search_signatures.json")
+
+
+def sample_positions(games=20, seed=0):
+    """
+    Returns all the positions of a number of random games (the same ones on
+    every run).
+    """
+    rng = random.Random(seed)
+    positions = []
+    for _ in range(games):
+        position = Position()
+        while position.winner is None:
+            positions.append(position)
+            origin = rng.choice(list(position.all_legal_moves))
+            target = rng.choice(list(position.all_legal_moves[origin]))
+            tag = position.all_legal_moves[origin][target]
+            position = position.new_position_after_move(origin, target, tag)
+    return positions
+
+
+def report(name, function, count, repeat=5):
+    """
+    Runs function repeat times and prints the best time per operation, where
+    count is the number of operations performed by each run.
+    """
+    best = min(timed(function) for _ in range(repeat))
+    print(f"{name:<24} {1e6 * best / count:10.2f} us/op {count / best:12.0f} op/s")
+
+
+def timed(function):
+    start = time.perf_counter()
+    function()
+    return time.perf_counter() - start
+
+
+def bench_movegen(positions):
+    def generate():
+        for position in positions:
+            position.get_all_legal_moves()
+
+    def make_moves():
+        for position in positions:
+            for origin, targets in position.all_legal_moves.items():
+                for target, tag in targets.items():
+                    position.new_position_after_move(origin, target, tag)
+
+    moves = sum(
+        len(targets)
+        for position in positions
+        for targets in position.all_legal_moves.values()
+    )
+    report("movegen", generate, len(positions))
+    report("make move", make_moves, moves)
+
+
+def perft(position, depth, mismatches=None):
+    """
+    Returns the number of positions reached after depth moves. If mismatches is a
+    list, the legal moves of every position reached (maintained incrementally) are
+    checked against the moves generated from scratch, and the text encodings of
+    the positions where they differ are appended to it.
+    """
+    if mismatches is not None and not position.is_crowning_pending():
+        full = position.copy(with_legal_moves=False)
+        full.checker_moves = None
+        if full.get_other_moves() != position.get_other_moves():
+            mismatches.append(position.to_text())
+    if not depth or position.winner is not None:
+        return 1
+    return sum(
+        perft(
+            position.new_position_after_move(origin, target, tag),
+            depth - 1,
+            mismatches,
+        )
+        for origin, targets in position.all_legal_moves.items()
+        for target, tag in targets.items()
+    )
+
+
+def bench_perft(positions, depth=4):
+    # Counts the positions reached from the starting position, then checks the
+    # incrementally maintained moves at depth 2 from every 50th position
+    start = time.perf_counter()
+    nodes = perft(Position(), depth)
+    elapsed = time.perf_counter() - start
+    print(
+        f"{f'perft (depth {depth})':<24} {nodes:10d} nodes"
+        f" {nodes / elapsed:12.0f} nodes/s"
+    )
+    mismatches = []
+    checked = sum(perft(position, 2, mismatches) for position in positions[::50])
+    print(
+        f"perft validation: {len(mismatches)} mismatches in {checked} positions"
+        + "".join(f"\n    {text}" for text in mismatches[:10])
+    )
+
+
+def bench_evaluate(positions):
+    def evaluate():
+        for position in positions:
+            position.evaluate()
+
+    report("evaluate", evaluate, len(positions))
+
+
+def bench_search(positions, depth=4):
+    # Every 200th position, searched at a fixed depth with an empty TT
+    positions = positions[::200]
+
+    nodes = hits = lookups = 0
+
+    def search():
+        nonlocal nodes, hits, lookups
+        nodes = hits = lookups = 0
+        for position in positions:
+            ai = AI(position.turn)
+            ai.start_search(inf, inf)
+            ai.alpha_beta(position, depth, -inf, inf)
+            nodes += ai.nodes
+            hits += ai.evaluation_cache.hits
+            lookups += ai.evaluation_cache.hits + ai.evaluation_cache.misses
+
+    best = min(timed(search) for _ in range(3))
+    print(
+        f"{f'search (depth {depth})':<24} {1e6 * best / len(positions):10.2f} us/op"
+        f" {nodes / best:12.0f} nodes/s {hits / lookups:6.1%} eval cache hits"
+    )
+
+
+def allocated(function):
+    """
+    Returns the memory allocated (and still held) by the objects returned by function.
+    """
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    objects = function()
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del objects
+    return after - before
+
+
+def bench_memory(positions):
+    # The memory held by positions (without and with their legal moves) and by
+    # the best moves stored during a search
+    def children(with_legal_moves):
+        def make_children():
+            children = []
+            for position in positions[::10]:
+                for origin, targets in position.all_legal_moves.items():
+                    for target, tag in targets.items():
+                        child = position.new_position_after_move(origin, target, tag)
+                        if with_legal_moves:
+                            child.all_legal_moves
+                        children.append(child)
+            return children
+
+        return make_children
+
+    count = len(children(False)())
+    for with_legal_moves in (False, True):
+        size = allocated(children(with_legal_moves)) - 8 * count
+        name = "position" + (" + moves" if with_legal_moves else "")
+        print(f"{name:<24} {size / count:10.0f} bytes")
+
+    def retrieved_moves():
+        ai = AI(WHITE)
+        ai.start_search(inf, inf)
+        for position in positions[::200]:
+            ai.alpha_beta(position, 3, -inf, inf)
+        return [ai.tt_retrieve(position)[1] for position in positions[::200] * 100]
+
+    count = len(positions[::200]) * 100
+    size = allocated(retrieved_moves) - 8 * count
+    print(f"{'TT move (retrieved)':<24} {size / count:10.0f} bytes")
+    print(f"{'TT entry (stored)':<24} {ENTRY.size:10d} bytes")
+
+
+def bench_startup(positions, runs=10):
+    # The time taken by a fresh interpreter to import the engine core (as each
+    # worker process does) compared with the interpreter alone
+    def start(statement):
+        def run():
+            for _ in range(runs):
+                subprocess.run([sys.executable, "-c", statement], check=True)
+
+        return run
+
+    report("startup (interpreter)", start("pass"), runs, repeat=3)
+    report("startup (impasse.ai)", start("import impasse.ai"), runs, repeat=3)
+
+
+def signature(positions):
+    """
+    Returns a digest of the results of the engine core (legal moves, hashes,
+    encodings, evaluations and searches) on the positions.
+    """
+    digest = hashlib.sha256()
+    for position in positions[::10]:
+        digest.update(
+            repr(
+                (
+                    sorted(
+                        (origin, target, tag)
+                        for origin, targets in position.all_legal_moves.items()
+                        for target, tag in targets.items()
+                        if target is not None
+                    ),
+                    position.state_hash,
+                    position.mirror_hash,
+                    position.to_bytes(),
+                    position.evaluate(),
+                )
+            ).encode()
+        )
+    for position in positions[::200]:
+        ai = AI(position.turn)
+        ai.start_search(inf, inf)
+        digest.update(repr(ai.alpha_beta(position, 3, -inf, inf)).encode())
+    return digest.hexdigest()
+
+
+def search_signatures(positions, depth=5):
+    """
+    Returns the search signature of every 200th position: the number of nodes
+    searched by iterative deepening up to each depth (with a depth limited, and thus
+    reproducible, search), along with the best move and value found. Any change in
+    the search shows up in some of them.
+    """
+    signatures = {}
+    for position in positions[::200]:
+        ai = AI(position.turn, depth=depth)
+        nodes = []
+        _, value, best_move = ai.iterative_deepening(
+            position,
+            info=lambda depth, value, searched, *_: nodes.append(searched),
+            **ai.search_limits(),
+        )
+        signatures[position.to_text()] = {
+            "nodes": nodes,
+            "value": value,
+            "best_move": move_to_string(*best_move[:2]),
+        }
+    return signatures
+
+
+def bench_signatures(positions, record=False):
+    # Checks that the search is unchanged (or records its signatures)
+    start = time.perf_counter()
+    signatures = search_signatures(positions)
+    elapsed = time.perf_counter() - start
+    if record or not os.path.exists(SIGNATURES_FILE):
+        with open(SIGNATURES_FILE, "w") as file:
+            json.dump(signatures, file, indent=4)
+        print(f"search signatures: recorded in {elapsed:.1f} s")
+        return
+    with open(SIGNATURES_FILE) as file:
+        recorded = json.load(file)
+    changed = [text for text in signatures if signatures[text] != recorded.get(text)]
+    print(
+        f"search signatures: {len(changed)} changed out of {len(signatures)}"
+        f" in {elapsed:.1f} s"
+    )
+    for text in changed:
+        print(f"    {text}: {recorded.get(text)} -> {signatures[text]}")
+
+
+def bench_parity(positions):
+    # Compares the results of the compiled and the pure Python backends, each run
+    # in a fresh interpreter
+    signatures = {}
+    for backend in ("compiled", "python"):
+        environment = dict(os.environ, IMPASSE_BACKEND=backend)
+        signatures[backend] = subprocess.run(
+            [
+                sys.executable,
+                "-c",
+                "import benchmark, impasse; print(impasse.BACKEND, "
+                "benchmark.signature(benchmark.sample_positions()))",
+            ],
+            env=environment,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.split()
+    if signatures["compiled"][0] != "compiled":
+        print("parity: no compiled build (see build_ext.py)")
+    elif signatures["compiled"][1] == signatures["python"][1]:
+        print("parity: ok")
+    else:
+        print("parity: MISMATCH between the compiled and the pure Python backends")
+
+
+BENCHMARKS = {
+    "movegen": bench_movegen,
+    "perft": bench_perft,
+    "evaluate": bench_evaluate,
+    "search": bench_search,
+    "startup": bench_startup,
+    "parity": bench_parity,
+    "memory": bench_memory,
+    "signatures": bench_signatures,
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the engine core.")
+    parser.add_argument(
+        "benchmarks", nargs="*", help=f"any of: {', '.join(BENCHMARKS)}"
+    )
+    parser.add_argument(
+        "--record", action="store_true", help="record the search signatures"
+    )
+    args = parser.parse_args()
+    for name in args.benchmarks:
+        if name not in BENCHMARKS:
+            parser.error(f"unknown benchmark: {name}")
+    positions = sample_positions()
+    print(f"{len(positions)} positions ({BACKEND} backend)")
+    for name in args.benchmarks or BENCHMARKS:
+        if name == "signatures":
+            bench_signatures(positions, args.record)
+        else:
+            BENCHMARKS[name](positions)
+
+
+if __name__ == "__main__":
+    main()
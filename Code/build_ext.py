@@ -0,0 +1,29 @@
+"""
+Optional compiled build of the engine core. Requires Cython and a C compiler.
+
+Usage:
+    python build_ext.py
+
+Compiles the modules listed in impasse.COMPILED_MODULES into extension modules
+placed next to their sources, which are then imported instead of the sources.
+Setting the environment variable IMPASSE_BACKEND=python switches back to the
+pure Python modules without removing the build, and
+"python benchmark.py parity" checks that both backends give the same results.
+"""
+
+import os
+import sys
+
+from Cython.Build import cythonize
+from setuptools import setup
+
+from impasse import COMPILED_MODULES
+
+setup(
+    name="impasse-core",
+    ext_modules=cythonize(
+        [os.path.join("impasse", module + ".py") for module in COMPILED_MODULES],
+        compiler_directives={"language_level": 3, "annotation_typing": False},
+    ),
+    script_args=sys.argv[1:] or ["build_ext", "--inplace"],
+)
@@ -0,0 +1,9 @@
+"""
+Runs the headless engine, reading commands from stdin and writing to stdout
+(see impasse.engine for the protocol).
+"""
+
+from impasse.engine import main
+
+if __name__ == "__main__":
+    main()
@@ -1,3 +1,45 @@
+import importlib.util
+import os
+import sys
+
+# Modules of the engine core which can be compiled (see build_ext.py). When a
+# compiled build is present it is imported instead of the sources, unless the
+# environment variable IMPASSE_BACKEND is set to "python".
+COMPILED_MODULES = ("position", "ai", "transposition_table")
+
+
+class SourceFinder:
+    """
+    Finds the pure Python sources of the compiled modules.
+    """
+
+    @staticmethod
+    def find_spec(name, path=None, target=None):
+        package, _, module = name.rpartition(".")
+        if package == __name__ and module in COMPILED_MODULES:
+            return importlib.util.spec_from_file_location(
+                name, os.path.join(os.path.dirname(__file__), module + ".py")
+            )
+        return None
+
+
+if os.environ.get("IMPASSE_BACKEND") == "python":
+    sys.meta_path.insert(0, SourceFinder)
+
 from impasse.position import *
-from impasse.gui import *
 from impasse.ai import *
+
+# The backend in use ("compiled" or "python")
+BACKEND = "python" if position.__file__.endswith(".py") else "compiled"
+
+
+def __getattr__(name):
+    """
+    Loads the GUI (and with it pygame) only when it is first used, so that the
+    engine core can be imported without pygame.
+    """
+    if name == "GUI":
+        from impasse.gui import GUI
+
+        return GUI
+    raise AttributeError(f"module 'impasse' has no attribute '{name}'")
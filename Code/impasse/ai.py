@@ -1,9 +1,13 @@
 from math import inf
+import os
 import random
 import time
 
 from impasse.constants import *
+from impasse.game_records import *
 from impasse.position import *
+from impasse.solver import *
+from impasse.transposition_table import *
 
 
 class AI:
@@ -12,20 +16,87 @@ class AI:
     with move-ordering, iterative deepening and a transposition table.
     """
 
-    def __init__(self, color):
+    def __init__(self, color, tt_path=None, nodes=None, depth=None, seed=None):
+        """
+        If tt_path is the path of a saved transposition table, the AI starts
+        with that table. If nodes or depth is given, suggested_move searches up to
+        that number of nodes or depth instead of using the clock, so that (along
+        with a seed for get_random_move) the moves of the AI are reproducible.
+        """
         self.color = color
-        self.transposition_table = {}
+        self.nodes_per_move = nodes
+        self.depth_per_move = depth
+        self.random = random.Random(seed)
+        # Search limits (see iterative_deepening)
+        self.milliseconds_per_move = MILLISECONDS_PER_MOVE
+        self.max_milliseconds_per_move = MAX_MILLISECONDS_PER_MOVE
+        self.max_nodes = None
+        self.nodes = 0
+        # The largest ply reached by the current search
+        self.selective_depth = 0
+        self.first_depth_completed = False
+        self.stop_requested = False
+        # Triangular table of the principal variations found at each ply, and the
+        # principal variation of the last completed iteration
+        self.pv_table = []
+        self.principal_variation = []
+        self.transposition_table = (
+            TranspositionTable(path=tt_path)
+            if tt_path and os.path.exists(tt_path)
+            else TranspositionTable()
+        )
+        self.evaluation_cache = EvaluationCache()
+        self.solver = ProofNumberSolver()
 
-    # Transposition table retrieval and storage
+    # Transposition table retrieval and storage. A position and its mirrored position
+    # (see MIRRORED_SQUARE) share one entry, stored under the smaller of their hashes
+    # from the point of view of the corresponding position (so for the other position
+    # its value is negated, its bounds are swapped and its move is mirrored).
 
     def tt_retrieve(self, position: Position):
-        try:
-            return self.transposition_table[position.state_hash]
-        except KeyError:
-            return None, None, None, None
+        if position.mirror_hash < position.state_hash:
+            value, move, flag, depth = self.transposition_table.retrieve(
+                position.mirror_hash
+            )
+            if not flag:
+                return None, None, None, None
+            return -value, mirror_move(move), MIRRORED_TT_FLAGS[flag], depth
+        return self.transposition_table.retrieve(position.state_hash)
 
     def tt_store(self, position: Position, value, move, flag, depth):
-        self.transposition_table[position.state_hash] = (value, move, flag, depth)
+        if position.mirror_hash < position.state_hash:
+            self.transposition_table.store(
+                position.mirror_hash,
+                -value,
+                mirror_move(move),
+                MIRRORED_TT_FLAGS[flag],
+                depth,
+            )
+        else:
+            self.transposition_table.store(
+                position.state_hash, value, move, flag, depth
+            )
+
+    def tt_principal_variation(self, position: Position, move, max_length):
+        """
+        Returns the principal variation of a position starting with move, followed
+        by the moves of the exact TT entries of the positions it leads to (up to
+        max_length moves, and only as long as the moves are legal, since different
+        positions may share a TT entry).
+        """
+        variation = []
+        flag = EXACT
+        while move and flag == EXACT and len(variation) < max_length:
+            origin, target, tag = move
+            if position.all_legal_moves.get(origin, {}).get(target, ()) != tag:
+                break
+            variation.append(move)
+            position = position.new_position_after_move(*move)
+            _, move, flag, _ = self.tt_retrieve(position)
+        return variation
+
+    def save_transposition_table(self, tt_path):
+        self.transposition_table.save(tt_path)
 
     # Finding moves
 
@@ -33,17 +104,49 @@ class AI:
         """
         Returns a move randomly chosen amongst the available moves of the position.
         """
-        origin = random.choice(list(position.all_legal_moves))
-        target = random.choice(list(position.all_legal_moves[origin]))
+        origin = self.random.choice(list(position.all_legal_moves))
+        target = self.random.choice(list(position.all_legal_moves[origin]))
         tag = position.all_legal_moves[origin][target]
         return origin, target, tag
 
     def ordered_moves(self, position: Position, most_promising_move=None):
         """
-        Returns an ordered list of the available moves which hopefully generally increases
+        Yields the available moves in an order which hopefully generally increases
         the number of prunings during Alpha-Beta search. The moves are ordered as follows:
+        - the most promising move (e.g. the TT move)
         - crowning moves (these are played necessarily)
         - bear offs
+        - the quiet moves, ordered by ordered_quiet_moves
+        The moves are generated in stages, so that a cutoff saves the work of the later
+        stages: the legality of the most promising move is checked without generating
+        all the moves, and the quiet moves are only classified after the tactical moves
+        (crownings and bear offs) have been searched.
+        """
+        if most_promising_move is not None and position.is_legal_move(
+            *most_promising_move
+        ):
+            yield most_promising_move
+        crownings = []
+        bear_offs = []
+        quiet_moves = []
+        for origin, moves in position.all_legal_moves.items():
+            for target, tag in moves.items():
+                move = (origin, target, tag)
+                if move == most_promising_move:
+                    continue
+                elif tag == "C":
+                    crownings.append(move)
+                elif tag in ("B", "SB", "TB"):
+                    bear_offs.append(move)
+                else:
+                    quiet_moves.append(move)
+        yield from crownings
+        yield from bear_offs
+        yield from self.ordered_quiet_moves(position, quiet_moves)
+
+    def ordered_quiet_moves(self, position: Position, quiet_moves):
+        """
+        Returns the quiet moves (slides and transposes) ordered as follows:
         - slides that block two enemy doubles
         - slides that block one enemy double
         - slides that block two enemy singles
@@ -51,10 +154,9 @@ class AI:
         - moves that lead to a potential crowning
         - transpositions
         - the rest of the slides ordered from longest to shortest
+        A slide blocks the enemy checkers which could otherwise slide to its target,
+        as counted from the moves of each checker (see Position.update_checker_moves).
         """
-        check_first = []
-        bear_offs = []
-        crownings = []
         potential_crownings = []
         transposes = []
         slides_blocking_doubles_once = []
@@ -62,73 +164,37 @@ class AI:
         slides_blocking_singles_once = []
         slides_blocking_singles_twice = []
         other_slides = []
-        for origin in position.all_legal_moves:
-            moves = position.all_legal_moves[origin]
-            for target in moves:
-                tag = moves[target]
-                move = (origin, target, tag)
-                if move == most_promising_move:
-                    check_first = [move]
-                elif tag == "C":
-                    crownings.append(move)
-                elif tag in ("B", "SB", "TB"):
-                    bear_offs.append(move)
-                elif tag in ("SC", "TC"):
-                    potential_crownings.append(move)
-                elif tag == "T":
-                    transposes.append(move)
-                elif tag == "S":
-                    blocks_double_once = False
-                    blocks_double_twice = False
-                    blocks_single_once = False
-                    blocks_single_twice = False
-                    color = position.turn
-                    for direction in MOVE_DIRECTIONS[(color, 2)]:
-                        for cell in DIAGONALS[(target, direction)]:
-                            if not position.is_occupied(cell):
-                                continue
-                            if position.is_occupied_of_color(
-                                cell, OPPOSITE_COLOR[color]
-                            ) and not position.is_single(cell):
-                                if blocks_double_once:
-                                    blocks_double_twice = True
-                                else:
-                                    blocks_double_once = True
-                                break
-                            else:
-                                break
-                    if blocks_double_twice:
-                        slides_blocking_doubles_twice.append(move)
-                    elif blocks_double_once:
-                        slides_blocking_doubles_once.append(move)
-                    else:
-                        for direction in MOVE_DIRECTIONS[(color, 1)]:
-                            for cell in DIAGONALS[(target, direction)]:
-                                if not position.is_occupied(cell):
-                                    continue
-                                if position.is_occupied_single_of_color(
-                                    cell, OPPOSITE_COLOR[color]
-                                ):
-                                    if blocks_single_once:
-                                        blocks_single_twice = True
-                                    else:
-                                        blocks_single_once = True
-                                    break
-                                else:
-                                    break
-                        if blocks_single_twice:
-                            slides_blocking_singles_twice.append(move)
-                        elif blocks_single_once:
-                            slides_blocking_singles_once.append(move)
-                        else:
-                            other_slides.append(move)
-
-        other_slides.sort(reverse=True, key=lambda x: abs(x[0][0] - x[1][0]))
+        # The number of enemy doubles and singles which could slide to each square
+        enemy_color = OPPOSITE_COLOR[position.turn]
+        double_reach = [0] * len(SQUARES)
+        single_reach = [0] * len(SQUARES)
+        state = position.state
+        for square, moves in enumerate(position.update_checker_moves()):
+            if moves is not None and PIECE_COLOR[state[square]] == enemy_color:
+                reach = double_reach if PIECE_TYPE[state[square]] == 2 else single_reach
+                for target in moves:
+                    reach[target] += 1
+        for move in quiet_moves:
+            _, target, tag = move
+            if tag in ("SC", "TC"):
+                potential_crownings.append(move)
+            elif tag == "T":
+                transposes.append(move)
+            elif tag == "S":
+                if double_reach[target] == 2:
+                    slides_blocking_doubles_twice.append(move)
+                elif double_reach[target] == 1:
+                    slides_blocking_doubles_once.append(move)
+                elif single_reach[target] == 2:
+                    slides_blocking_singles_twice.append(move)
+                elif single_reach[target] == 1:
+                    slides_blocking_singles_once.append(move)
+                else:
+                    other_slides.append(move)
+
+        other_slides.sort(reverse=True, key=lambda x: abs(COLUMN[x[0]] - COLUMN[x[1]]))
         return (
-            check_first
-            + crownings
-            + bear_offs
-            + slides_blocking_doubles_twice
+            slides_blocking_doubles_twice
             + slides_blocking_doubles_once
             + slides_blocking_singles_twice
             + slides_blocking_singles_once
@@ -137,6 +203,21 @@ class AI:
             + other_slides
         )
 
+    def child_depth(
+        self, position: Position, new_position: Position, depth, extensions
+    ):
+        """
+        Returns the depth to search a child position to, along with the number of
+        extensions used along the line leading to it. After a move which lets the same
+        player move again (to crown a checker) the depth is not reduced, so that the
+        move and the crowning count as one ply. Such extensions are capped at
+        MAX_EXTENSIONS per line, as they would otherwise make the search time
+        unpredictable and the depths of different searches incomparable.
+        """
+        if new_position.turn == position.turn and extensions < MAX_EXTENSIONS:
+            return depth, extensions + 1
+        return depth - 1, extensions
+
     def minimax_parameters(self, color):
         """
         A helper function which returns the correct starting parameters to
@@ -161,87 +242,149 @@ class AI:
         depth,
         alpha,
         beta,
+        ply=0,
+        on_pv=False,
+        extensions=0,
     ):
         """
         Implements Alpha-Beta search (MiniMax formulation) enhanced by the use of a transposition table.
         Returns the Alpha-Beta evaluation of the position along with the best move found.
+        The principal variation from the position is stored in pv_table[ply]. If on_pv is True,
+        the position lies on the principal variation of the previous iteration, and the move of
+        that variation is searched first. extensions is the number of extensions (see
+        child_depth) used along the line leading to the position.
+
+        No position can occur twice in a game: every move either removes a checker (bear offs,
+        impasses), merges two checkers (crownings), or moves singles forward and doubles
+        backward (slides and transposes). Hence there are no cycles to detect, and the values
+        stored in the TT do not depend on the path leading to a position.
         """
 
-        # Terminate if you run out of time
+        # Terminate if you run out of time or nodes, or if the search is stopped
+        # (the search at depth 1 is always completed)
+        self.nodes += 1
+        self.selective_depth = max(self.selective_depth, ply)
+        while ply >= len(self.pv_table):
+            self.pv_table.append([])
         move_time = milliseconds(time.time()) - self.search_start_time
-        if (
-            move_time > MILLISECONDS_PER_MOVE and self.min_search_depth_reached
-        ) or move_time > MAX_MILLISECONDS_PER_MOVE:
+        if self.first_depth_completed and (
+            (move_time > self.milliseconds_per_move and self.min_search_depth_reached)
+            or move_time > self.max_milliseconds_per_move
+            or (self.max_nodes and self.nodes > self.max_nodes)
+            or self.stop_requested
+        ):
             raise ABTimeOut
 
-        old_alpha, old_beta = alpha, beta
         # Search for the position in the transposition table. If the search depth in
-        # the TT is larger than the current search depth, then trust the TT entry.
+        # the TT is larger than the current search depth, then trust the TT entry,
+        # except at the root and on the principal variation of the previous
+        # iteration, which are always searched so that the principal variation is
+        # extended rather than cut short.
         tt_value, tt_move, tt_flag, tt_depth = self.tt_retrieve(position)
-        if tt_depth is not None and tt_depth >= depth:
-            if tt_flag == "E":
+        if tt_depth is not None and tt_depth >= depth and not (ply == 0 or on_pv):
+            if tt_flag == EXACT:
+                self.pv_table[ply] = self.tt_principal_variation(
+                    position, tt_move, depth
+                )
                 return tt_value, tt_move
-            elif tt_flag == "L":
+            elif tt_flag == LOWER_BOUND:
                 alpha = max(alpha, tt_value)
-            elif tt_flag == "U":
+            elif tt_flag == UPPER_BOUND:
                 beta = min(beta, tt_value)
             if alpha >= beta:
+                self.pv_table[ply] = [tt_move] if tt_move else []
                 return tt_value, tt_move
+        # The flag of the value found is determined by the window it is searched
+        # with, after any narrowing by the TT bounds
+        old_alpha, old_beta = alpha, beta
 
         # Regular Alpha-Beta
         if position.winner or not depth:
-            return position.evaluate(), None
+            self.pv_table[ply] = []
+            return self.evaluation_cache.evaluate(position), None
 
         start_value, value_test, alpha_beta_assignment = self.minimax_parameters(
             position.turn
         )
         value = start_value
-        # Check TT move first
-        for origin, target, tag in self.ordered_moves(position, tt_move):
-            new_position = position.new_position_after_move(origin, target, tag)
-            if new_position.turn == position.turn:
-                local_value, _ = self.alpha_beta(new_position, depth, alpha, beta)
-            else:
-                local_value, _ = self.alpha_beta(new_position, depth - 1, alpha, beta)
+        # Check the move of the previous principal variation or the TT move first
+        pv_move = (
+            self.principal_variation[ply]
+            if on_pv and ply < len(self.principal_variation)
+            else None
+        )
+        for move in self.ordered_moves(position, pv_move or tt_move):
+            new_position = position.new_position_after_move(*move)
+            child_depth, child_extensions = self.child_depth(
+                position, new_position, depth, extensions
+            )
+            local_value, _ = self.alpha_beta(
+                new_position,
+                child_depth,
+                alpha,
+                beta,
+                ply + 1,
+                on_pv and move == pv_move,
+                child_extensions,
+            )
             if value_test(local_value, value):
                 value = local_value
-                best_move = (origin, target, tag)
+                best_move = move
+                self.pv_table[ply] = [move] + self.pv_table[ply + 1]
             alpha, beta = alpha_beta_assignment(alpha, beta, value)
             if alpha >= beta:
                 break
 
         # Store the position in the TT
         if value <= old_alpha:
-            flag = "U"
+            flag = UPPER_BOUND
         elif value >= old_beta:
-            flag = "L"
+            flag = LOWER_BOUND
         else:
-            flag = "E"
+            flag = EXACT
         self.tt_store(position, value, best_move, flag, depth)
 
         return value, best_move
 
-    def iterative_deepening(self, position: Position):
+    def iterative_deepening(
+        self,
+        position: Position,
+        max_depth=None,
+        milliseconds_per_move=None,
+        max_milliseconds_per_move=None,
+        min_search_depth=None,
+        max_nodes=None,
+        info=None,
+    ):
         """
         This function implements iterative deepening. The AI searches at depth 1,2,...
         until it reaches MIN_SEARCH_DEPTH. At this point it keeps searching deeper until
         it runs out of time (as defined by MILLISECONDS_PER_MOVE). All search stops however
         (even if MIN_SEARCH_DEPTH has not been reached) if calculation time exceeds
-        MAX_MILLISECONDS_PER_MOVE. The function returns the last value and move found, along
-        with the depth at which they were found.
+        MAX_MILLISECONDS_PER_MOVE, but the search at depth 1 is always completed. The
+        function returns the last value and move found, along with the depth at which
+        they were found.
+
+        The defaults can be overridden, and the search can also be limited to max_depth
+        (MAX_SEARCH_DEPTH by default) or to max_nodes, or stopped from another thread
+        by calling stop. After each completed depth, the principal variation found is
+        stored in principal_variation (and is searched first at the next depth), and
+        info (if given) is called with the depth, the value, the number of nodes
+        searched, the elapsed time in milliseconds and the principal variation.
         """
+        self.start_search(
+            milliseconds_per_move,
+            max_milliseconds_per_move,
+            min_search_depth,
+            max_nodes,
+        )
         search_depth = 1
-        self.min_search_depth_reached = False
-        self.search_start_time = milliseconds(time.time())
-        while True:
-            if search_depth > MIN_SEARCH_DEPTH:
+        while search_depth <= (max_depth or MAX_SEARCH_DEPTH):
+            if search_depth > self.min_search_depth:
                 self.min_search_depth_reached = True
             try:
                 value, best_move = self.alpha_beta(
-                    position,
-                    search_depth,
-                    -inf,
-                    inf,
+                    position, search_depth, -inf, inf, on_pv=True
                 )
             except ABTimeOut:
                 break
@@ -250,16 +393,175 @@ class AI:
                 value,
                 best_move,
             )
+            self.principal_variation = self.pv_table[0]
+            if info:
+                info(
+                    search_depth,
+                    value,
+                    self.nodes,
+                    milliseconds(time.time()) - self.search_start_time,
+                    self.principal_variation,
+                )
+            self.first_depth_completed = True
             search_depth += 1
 
+        self.stop_requested = False
         return prev_search_depth, prev_value, prev_best_move
 
+    def multi_pv(
+        self,
+        position: Position,
+        k,
+        max_depth=None,
+        milliseconds_per_move=None,
+        max_milliseconds_per_move=None,
+        min_search_depth=None,
+        max_nodes=None,
+        info=None,
+    ):
+        """
+        Searches for the k best moves of the position by iterative deepening (with the
+        same limits as iterative_deepening). Returns a list of (value, move, principal
+        variation) for each of them, best first, as found at the last completed depth.
+
+        At each depth the root moves are searched in the order of their values at the
+        previous depth, and each move is searched with a window bounded by the k-th
+        best value found so far, so that moves which do not make it to the top k are
+        refuted cheaply. After each completed depth, info (if given) is called with the
+        depth, the number of nodes searched, the elapsed time in milliseconds and the
+        list of results.
+        """
+        if position.winner is not None:
+            return []
+        self.start_search(
+            milliseconds_per_move,
+            max_milliseconds_per_move,
+            min_search_depth,
+            max_nodes,
+        )
+        _, tt_move, _, _ = self.tt_retrieve(position)
+        root_moves = list(self.ordered_moves(position, tt_move))
+        # Values are compared from the point of view of the player to move
+        sign = 1 if position.turn == WHITE else -1
+        results = []
+        search_depth = 1
+        while search_depth <= (max_depth or MAX_SEARCH_DEPTH):
+            if search_depth > self.min_search_depth:
+                self.min_search_depth_reached = True
+            values = {}
+            principal_variations = {}
+            top_values = []
+            try:
+                for move in root_moves:
+                    new_position = position.new_position_after_move(*move)
+                    depth, extensions = self.child_depth(
+                        position, new_position, search_depth, 0
+                    )
+                    bound = top_values[k - 1] if len(top_values) >= k else -inf
+                    if position.turn == WHITE:
+                        alpha, beta = bound, inf
+                    else:
+                        alpha, beta = -inf, -bound
+                    value, _ = self.alpha_beta(
+                        new_position, depth, alpha, beta, 1, False, extensions
+                    )
+                    values[move] = value
+                    principal_variations[move] = [move] + self.pv_table[1]
+                    if sign * value > bound:
+                        top_values.append(sign * value)
+                        top_values.sort(reverse=True)
+            except ABTimeOut:
+                break
+            # Moves outside the top k only have upper bounds, which do not exceed
+            # the values of the top k (and the sort is stable for ties)
+            root_moves.sort(key=lambda move: -sign * values[move])
+            self.tt_store(
+                position, values[root_moves[0]], root_moves[0], EXACT, search_depth
+            )
+            results = [
+                (values[move], move, principal_variations[move])
+                for move in root_moves[:k]
+            ]
+            if info:
+                info(
+                    search_depth,
+                    self.nodes,
+                    milliseconds(time.time()) - self.search_start_time,
+                    results,
+                )
+            self.first_depth_completed = True
+            search_depth += 1
+
+        self.stop_requested = False
+        return results
+
+    def start_search(
+        self,
+        milliseconds_per_move=None,
+        max_milliseconds_per_move=None,
+        min_search_depth=None,
+        max_nodes=None,
+    ):
+        """
+        Sets the limits of a new search (using the defaults of ai_constants for the
+        ones not given) and starts its clock.
+        """
+        self.milliseconds_per_move = (
+            MILLISECONDS_PER_MOVE
+            if milliseconds_per_move is None
+            else milliseconds_per_move
+        )
+        self.max_milliseconds_per_move = (
+            MAX_MILLISECONDS_PER_MOVE
+            if max_milliseconds_per_move is None
+            else max_milliseconds_per_move
+        )
+        self.min_search_depth = (
+            MIN_SEARCH_DEPTH if min_search_depth is None else min_search_depth
+        )
+        self.max_nodes = max_nodes
+        self.nodes = 0
+        self.selective_depth = 0
+        self.first_depth_completed = False
+        self.principal_variation = []
+        self.min_search_depth_reached = False
+        self.search_start_time = milliseconds(time.time())
+        self.transposition_table.new_generation()
+        self.evaluation_cache.hits = 0
+        self.evaluation_cache.misses = 0
+
+    def stop(self):
+        """
+        Stops the current search (called from another thread).
+        """
+        self.stop_requested = True
+
+    def search_limits(self):
+        """
+        Returns the limits of the searches of suggested_move: the defaults of
+        ai_constants, or only the nodes and depth per move if any of them is set,
+        in which case the results do not depend on the speed of the machine.
+        """
+        if self.nodes_per_move is None and self.depth_per_move is None:
+            return {}
+        return {
+            "max_depth": self.depth_per_move,
+            "milliseconds_per_move": inf,
+            "max_milliseconds_per_move": inf,
+            "min_search_depth": 0,
+            "max_nodes": self.nodes_per_move,
+        }
+
     def suggested_move(self, position: Position):
         """
         A function that returns the best move found by Alpha-Beta and prints
         some relevant data, such as the current evaluation and the Alpha-Beta
-        evaluation of the position.
+        evaluation of the position. In endgames (with at most SOLVER_MAX_CHECKERS
+        checkers) a winning move proven by the solver is returned without searching,
+        and in timed play the time taken by the solver counts towards the time of the
+        move.
         """
+        limits = self.search_limits()
         # If there is only one legal move, return it without searching
         origin, targets = (
             next(iter(position.all_legal_moves.items()))
@@ -270,10 +572,44 @@ class AI:
             target = next(iter(targets))
             tag = targets[target]
             depth = "0 (one legal move)"
-            value = position.evaluate()
+            value = self.evaluation_cache.evaluate(position)
             unique_move = True
         else:
-            depth, value, (origin, target, tag) = self.iterative_deepening(position)
+            if sum(position.checkers_total.values()) <= SOLVER_MAX_CHECKERS:
+                solver_start = milliseconds(time.time())
+                # Only the nodes of the solver are limited in reproducible searches
+                winner, move = self.solver.solve(
+                    position,
+                    milliseconds=(
+                        inf
+                        if limits
+                        else min(SOLVER_MILLISECONDS, MAX_MILLISECONDS_PER_MOVE)
+                    ),
+                )
+                if winner == position.turn:
+                    print(f"Solver: win proven in {self.solver.nodes} nodes")
+                    return (*move, False)
+                if not limits:
+                    solver_time = milliseconds(time.time()) - solver_start
+                    limits = {
+                        "milliseconds_per_move": max(
+                            MILLISECONDS_PER_MOVE - solver_time, 0
+                        ),
+                        "max_milliseconds_per_move": max(
+                            MAX_MILLISECONDS_PER_MOVE - solver_time, 0
+                        ),
+                    }
+            depth, value, (origin, target, tag) = self.iterative_deepening(
+                position, **limits
+            )
             unique_move = False
         print(f"Alpha-Beta evaluation: {value} at depth {depth}")
+        if not unique_move:
+            print(f"Evaluation cache hit rate: {self.evaluation_cache.hit_rate():.1%}")
+            print(
+                "Principal variation:",
+                " ".join(
+                    move_to_string(*move[:2]) for move in self.principal_variation
+                ),
+            )
         return origin, target, tag, unique_move
@@ -0,0 +1,182 @@
+"""
+Bulk analysis of recorded games.
+
+Games are read one at a time from a file of game records, replayed and analysed
+by a pool of worker processes, each searching every position with a fixed budget.
+One JSON line is appended to the output file per game, as soon as the game (and
+all the games before it) has been analysed, so that neither the games nor the
+results need to fit in memory. Rerunning the same command after an interruption
+skips the games already in the output file.
+
+Usage:
+    python -m impasse.analysis GAMES_FILE OUTPUT_FILE [--nodes N] [--movetime MS]
+"""
+
+import argparse
+from collections import deque
+from functools import partial
+import json
+from math import inf
+from multiprocessing import Pool
+import os
+
+from impasse.ai import *
+from impasse.constants import *
+from impasse.game_records import *
+from impasse.position import *
+
+# Default number of nodes searched per position
+ANALYSIS_NODES = 20000
+# Loss (from the point of view of the player to move) above which a move is a blunder
+BLUNDER_THRESHOLD = 100
+
+
+def search(ai: AI, position: Position, nodes, movetime):
+    """
+    Searches a position with the given budget. Returns its value and best move.
+    """
+    if position.winner is not None:
+        return position.evaluate(), None
+    _, value, best_move = ai.iterative_deepening(
+        position,
+        milliseconds_per_move=movetime or inf,
+        max_milliseconds_per_move=movetime or inf,
+        min_search_depth=0,
+        max_nodes=nodes,
+    )
+    return value, best_move
+
+
+def analyse_game(task, nodes=ANALYSIS_NODES, movetime=None):
+    """
+    Analyses the positions of a game. Returns the record written for the game: its
+    index, the values (from the point of view of WHITE) and best moves found for each
+    position, and the loss caused by each move played, along with the blunders.
+    Each game is analysed with a new TT, so that (with a node budget) its record
+    does not depend on the games analysed before it by the same worker.
+    """
+    index, line = task
+    try:
+        move_strings, winner = parse_game(line)
+    except (ValueError, KeyError):
+        return {"game": index, "moves": [], "error": f"Invalid record: {line.strip()}"}
+    record = {"game": index, "result": RESULT_STRINGS[winner], "moves": []}
+    ai = AI(WHITE)
+    position = Position()
+    value, best_move = search(ai, position, nodes, movetime)
+    for move_string in move_strings:
+        try:
+            move = string_to_move(position, move_string)
+        except ValueError as error:
+            record["error"] = str(error)
+            break
+        next_position = position.new_position_after_move(*move)
+        next_value, next_best_move = search(ai, next_position, nodes, movetime)
+        sign = 1 if position.turn == WHITE else -1
+        loss = max(sign * (value - next_value), 0)
+        record["moves"].append(
+            {
+                "move": move_string,
+                "value": value,
+                "best_move": move_to_string(*best_move[:2]),
+                "loss": loss,
+                "blunder": loss >= BLUNDER_THRESHOLD,
+            }
+        )
+        position, value, best_move = next_position, next_value, next_best_move
+    return record
+
+
+def read_tasks(path, done):
+    """
+    Yields the index and line of each record in a file of game records (or of
+    positions), skipping blank lines, comments and the indices in done.
+    """
+    with open(path) as file:
+        lines = (line for line in file if line.strip() and not line.startswith("#"))
+        for index, line in enumerate(lines):
+            if index not in done:
+                yield index, line
+
+
+def analysed_games(path, key="game"):
+    """
+    Returns the indices (under key) of the records already in an output file. A
+    partly written last line (left by an interruption) is removed.
+    """
+    done = set()
+    if not os.path.exists(path):
+        return done
+    with open(path, "rb+") as file:
+        end = 0
+        for line in file:
+            if not line.endswith(b"\n"):
+                file.truncate(end)
+                break
+            done.add(json.loads(line)[key])
+            end += len(line)
+    return done
+
+
+def analyse(
+    games_path, output_path, nodes=ANALYSIS_NODES, movetime=None, processes=None
+):
+    """
+    Analyses all the games of a file that are not yet in the output file, appending
+    their records to it in order. At most a few games per process are in flight at
+    any time, so memory use does not grow with the number of games. Yields each
+    record written.
+    """
+    done = analysed_games(output_path)
+    analyse_task = partial(analyse_game, nodes=nodes, movetime=movetime)
+    max_pending = 4 * (processes or os.cpu_count())
+    with Pool(processes) as pool, open(output_path, "a") as output:
+        pending = deque()
+        tasks = read_tasks(games_path, done)
+        while True:
+            for task in tasks:
+                pending.append(pool.apply_async(analyse_task, (task,)))
+                if len(pending) >= max_pending:
+                    break
+            if not pending:
+                break
+            record = pending.popleft().get()
+            output.write(json.dumps(record) + "\n")
+            output.flush()
+            yield record
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Analyse recorded games.")
+    parser.add_argument("games", help="file of game records")
+    parser.add_argument("output", help="file the analysis is appended to (JSON lines)")
+    parser.add_argument(
+        "--nodes",
+        type=int,
+        default=ANALYSIS_NODES,
+        help="number of nodes searched per position",
+    )
+    parser.add_argument(
+        "--movetime",
+        type=int,
+        default=None,
+        metavar="MS",
+        help="time limit per position (use --nodes 0 to search by time only)",
+    )
+    parser.add_argument("--processes", type=int, default=None)
+    args = parser.parse_args()
+    if not args.nodes and not args.movetime:
+        parser.error("--nodes 0 requires --movetime")
+
+    for record in analyse(
+        args.games, args.output, args.nodes or None, args.movetime, args.processes
+    ):
+        blunders = sum(move["blunder"] for move in record["moves"])
+        print(
+            f"Game {record['game']}: {len(record['moves'])} moves, {blunders} blunders"
+            + (f" ({record['error']})" if "error" in record else "")
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -2,30 +2,72 @@ import random
 from impasse.constants.position_constants import *
 
 MIN_SEARCH_DEPTH = 5
+# Iterative deepening stops at this depth even if time or nodes are left
+MAX_SEARCH_DEPTH = 64
+# Maximum number of extensions for moves followed by a crowning along each line
+MAX_EXTENSIONS = 2
 MILLISECONDS_PER_MOVE = 6000
 MAX_MILLISECONDS_PER_MOVE = 10000
+# Number of transposition table slots (a power of 2)
+TT_SIZE = 2**20
+# Number of evaluation cache slots (a power of 2)
+EVALUATION_CACHE_SIZE = 2**16
+
+# Monte Carlo tree search: the exploration constant of UCT, the number of random
+# moves of each playout before it is cut off and scored by the evaluation, and the
+# scale turning evaluations into win probabilities (1 / (1 + e^(-scale * eval)))
+UCT_EXPLORATION = 1.4
+PLAYOUT_MOVES = 6
+PLAYOUT_EVALUATION_SCALE = 0.01
+
+# Endgame solver: positions with at most SOLVER_MAX_CHECKERS checkers (of both players)
+# are first given to the proof-number solver, searching at most SOLVER_NODES nodes
+# for at most SOLVER_MILLISECONDS, with a table of SOLVER_TABLE_SIZE entries
+SOLVER_MAX_CHECKERS = 6
+SOLVER_NODES = 50000
+SOLVER_MILLISECONDS = 1000
+SOLVER_TABLE_SIZE = 2**18
+SOLVER_EPSILON = 0.25
 
 
 class ABTimeOut(Exception):
     pass
 
 
+class SolverLimitReached(Exception):
+    pass
+
+
 def milliseconds(time):
     return int(time * 1000)
 
 
-# Dictionary of random ids for each combination of (square, piece)
+# Random ids for each combination of (square, piece), indexed by square and by piece
 random.seed(42)
-rand_ids = {
-    (cell, (color, i)): random.getrandbits(64)
-    for cell in INITIAL_STATE
-    for color in (WHITE, BLACK)
-    for i in (1, 2)
-} | {(cell, None): random.getrandbits(64) for cell in INITIAL_STATE}
-
-
-def make_state_hash(state):
-    state_hash = 0
-    for cell in state:
-        state_hash ^= rand_ids[(cell, state[cell])]
+rand_ids = [[0] + [random.getrandbits(64) for piece in PIECES] for square in SQUARES]
+for square_ids in rand_ids:
+    square_ids[EMPTY] = random.getrandbits(64)
+# Random id included in the hash when BLACK is to move
+black_to_move_id = random.getrandbits(64)
+
+
+# Random ids giving the hash of the mirrored position (see MIRRORED_SQUARE), which is
+# kept along with the hash of each position, so that both can share one TT entry
+mirror_ids = [
+    [rand_ids[MIRRORED_SQUARE[square]][MIRRORED_PIECE[piece]] for piece in range(5)]
+    for square in range(len(SQUARES))
+]
+
+
+def make_state_hash(state, turn=WHITE):
+    state_hash = black_to_move_id if turn == BLACK else 0
+    for square, piece in enumerate(state):
+        state_hash ^= rand_ids[square][piece]
     return state_hash
+
+
+def make_mirror_hash(state, turn=WHITE):
+    mirror_hash = black_to_move_id if turn == WHITE else 0
+    for square, piece in enumerate(state):
+        mirror_hash ^= mirror_ids[square][piece]
+    return mirror_hash
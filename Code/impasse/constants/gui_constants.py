@@ -4,6 +4,9 @@ WIDTH, HEIGHT = 640, 640
 SQUARE_SIZE = WIDTH // 8
 RADIUS = 2 * SQUARE_SIZE // 5
 
+# RGB colors of the players' checkers
+RGB = {WHITE: (255, 255, 255), BLACK: (0, 0, 0)}
+
 INFO_WIDTH = 2 * WIDTH // 5
 INFO_HEIGHT_PLACEMENT = {WHITE: HEIGHT // 2, BLACK: 0}
 COLOR_NAME = {WHITE: "WHITE", BLACK: "BLACK"}
@@ -54,3 +57,15 @@ def string_to_cell(cell_string):
     if cell_string:
         return COLUMN_COORDS_LETTERS[cell_string[0]], int(cell_string[1]) - 1
     return None
+
+
+def square_to_string(square):
+    if square is not None:
+        return cell_to_string(SQUARES[square])
+    return None
+
+
+def string_to_square(square_string):
+    if square_string:
+        return SQUARE_INDEX[string_to_cell(square_string)]
+    return None
@@ -1,44 +1,219 @@
-WHITE = (255, 255, 255)
-BLACK = (0, 0, 0)
+import json
+import os
+
+# Players
+WHITE = 1
+BLACK = 2
 OPPOSITE_COLOR = {WHITE: BLACK, BLACK: WHITE}
 
-INITIAL_STATE = {
-    (i, j): (WHITE, 1)
-    if (i, j) in ((0, 0), (3, 1), (4, 0), (7, 1))
-    else (WHITE, 2)
-    if (i, j) in ((1, 7), (2, 6), (5, 7), (6, 6))
-    else (BLACK, 1)
-    if (i, j) in ((0, 6), (3, 7), (4, 6), (7, 7))
-    else (BLACK, 2)
-    if (i, j) in ((1, 1), (2, 0), (5, 1), (6, 0))
-    else None
-    for i in range(8)
-    for j in range(8)
-    if (i + j) % 2 == 0
-}
+# Contents of a square
+EMPTY = 0
+WHITE_SINGLE = 1
+WHITE_DOUBLE = 2
+BLACK_SINGLE = 3
+BLACK_DOUBLE = 4
+PIECES = (WHITE_SINGLE, WHITE_DOUBLE, BLACK_SINGLE, BLACK_DOUBLE)
+SINGLE = {WHITE: WHITE_SINGLE, BLACK: BLACK_SINGLE}
+DOUBLE = {WHITE: WHITE_DOUBLE, BLACK: BLACK_DOUBLE}
+# Color and type (1 for singles, 2 for doubles) of each piece, indexed by piece
+PIECE_COLOR = (None, WHITE, WHITE, BLACK, BLACK)
+PIECE_TYPE = (0, 1, 2, 1, 2)
+
+# Dark squares, indexed in a fixed order (by column, then by row)
+SQUARES = tuple((i, j) for i in range(8) for j in range(8) if (i + j) % 2 == 0)
+SQUARE_INDEX = {cell: square for square, cell in enumerate(SQUARES)}
+COLUMN = tuple(i for i, _ in SQUARES)
+
+INITIAL_STATE = tuple(
+    WHITE_SINGLE
+    if cell in ((0, 0), (3, 1), (4, 0), (7, 1))
+    else WHITE_DOUBLE
+    if cell in ((1, 7), (2, 6), (5, 7), (6, 6))
+    else BLACK_SINGLE
+    if cell in ((0, 6), (3, 7), (4, 6), (7, 7))
+    else BLACK_DOUBLE
+    if cell in ((1, 1), (2, 0), (5, 1), (6, 0))
+    else EMPTY
+    for cell in SQUARES
+)
 
 HOME_ROW = {
-    WHITE: ((0, 0), (2, 0), (4, 0), (6, 0)),
-    BLACK: ((1, 7), (3, 7), (5, 7), (7, 7)),
+    WHITE: tuple(SQUARE_INDEX[(i, 0)] for i in (0, 2, 4, 6)),
+    BLACK: tuple(SQUARE_INDEX[(i, 7)] for i in (1, 3, 5, 7)),
+}
+# Flags indexed by square
+IS_HOME_ROW = {
+    color: tuple(square in HOME_ROW[color] for square in range(len(SQUARES)))
+    for color in HOME_ROW
+}
+
+# The symmetry of the game: rotating the board by 180 degrees and swapping the colors
+# of the checkers (and the player to move). A left-right reflection is not a symmetry,
+# as it maps the dark squares to light ones. Indexed by square and by piece respectively
+MIRRORED_SQUARE = tuple(SQUARE_INDEX[(7 - i, 7 - j)] for i, j in SQUARES)
+MIRRORED_PIECE = (EMPTY, BLACK_SINGLE, BLACK_DOUBLE, WHITE_SINGLE, WHITE_DOUBLE)
+
+
+def mirror_move(move):
+    """
+    Returns the move (origin, target, tag) of the mirrored position corresponding to
+    move (the tag stays the same).
+    """
+    if move is None:
+        return None
+    origin, target, tag = move
+    return (
+        MIRRORED_SQUARE[origin],
+        None if target is None else MIRRORED_SQUARE[target],
+        tag,
+    )
+
+
+# Compact position encoding: each square is a base 5 digit (its piece),
+# followed by the side to move and whether a crowning is pending
+POSITION_BYTES = 10
+
+# Text encoding: one letter per checker, digits for runs of empty squares
+PIECE_LETTERS = {
+    WHITE_SINGLE: "w",
+    WHITE_DOUBLE: "W",
+    BLACK_SINGLE: "b",
+    BLACK_DOUBLE: "B",
 }
+LETTER_PIECES = {letter: piece for piece, letter in PIECE_LETTERS.items()}
+COLOR_LETTERS = {WHITE: "w", BLACK: "b"}
+LETTER_COLORS = {letter: color for color, letter in COLOR_LETTERS.items()}
+
+
+# Move tags (see Position.get_slides, Position.get_transposes, Position.get_crownings
+# and Position.get_other_moves) and their codes
+MOVE_TAGS = ("S", "SB", "SC", "T", "TB", "TC", "C", "B")
+MOVE_TAG_CODES = {tag: code for code, tag in enumerate(MOVE_TAGS)}
+
+# Moves (origin, target, tag) packed into a single int (see encode_move), which fits
+# in 16 bits. Bear offs use NO_TARGET as their target, and NO_MOVE stands for no move.
+NO_TARGET = len(SQUARES)
+# The move of each code (shared by all the moves decoded)
+DECODED_MOVES = tuple(
+    (origin, None if target == NO_TARGET else target, tag)
+    for origin in range(len(SQUARES))
+    for target in range(NO_TARGET + 1)
+    for tag in MOVE_TAGS
+) + (None,)
+NO_MOVE = len(DECODED_MOVES) - 1
+
+
+def encode_move(move):
+    """
+    Returns the code of a move (origin, target, tag), or NO_MOVE if move is None.
+    """
+    if move is None:
+        return NO_MOVE
+    origin, target, tag = move
+    target = NO_TARGET if target is None else target
+    return (origin * (NO_TARGET + 1) + target) * len(MOVE_TAGS) + MOVE_TAG_CODES[tag]
+
+
+def decode_move(code):
+    """
+    Returns the move (origin, target, tag) of a code given by encode_move.
+    """
+    return DECODED_MOVES[code]
 
 
 MOVE_DIRECTIONS = {
-    (WHITE, 1): ((1, 1), (-1, 1)),
-    (WHITE, 2): ((1, -1), (-1, -1)),
-    (BLACK, 1): ((1, -1), (-1, -1)),
-    (BLACK, 2): ((1, 1), (-1, 1)),
+    WHITE_SINGLE: ((1, 1), (-1, 1)),
+    WHITE_DOUBLE: ((1, -1), (-1, -1)),
+    BLACK_SINGLE: ((1, -1), (-1, -1)),
+    BLACK_DOUBLE: ((1, 1), (-1, 1)),
+}
+
+# Precomputed move tables, indexed by piece and then by square
+
+# The squares along each movement direction of a piece (closest first)
+RAYS = {
+    piece: tuple(
+        tuple(
+            tuple(
+                SQUARE_INDEX[(i + s * d[0], j + s * d[1])]
+                for s in range(1, 8)
+                if 0 <= i + s * d[0] < 8 and 0 <= j + s * d[1] < 8
+            )
+            for d in MOVE_DIRECTIONS[piece]
+        )
+        for i, j in SQUARES
+    )
+    for piece in MOVE_DIRECTIONS
+}
+
+# The lines of movement crossing each square: for each of the four diagonal
+# directions, the squares behind the square in that direction (closest first),
+# along with the pieces moving in that direction
+LINES_THROUGH = tuple(
+    tuple(
+        (
+            tuple(
+                SQUARE_INDEX[(i - s * d[0], j - s * d[1])]
+                for s in range(1, 8)
+                if 0 <= i - s * d[0] < 8 and 0 <= j - s * d[1] < 8
+            ),
+            frozenset(
+                piece
+                for piece, directions in MOVE_DIRECTIONS.items()
+                if d in directions
+            ),
+        )
+        for d in ((1, 1), (-1, 1), (1, -1), (-1, -1))
+    )
+    for i, j in SQUARES
+)
+
+
+def slide_tag(piece, target):
+    """
+    Returns the tag of a slide of piece to target (see Position.get_slides).
+    """
+    color = PIECE_COLOR[piece]
+    if IS_HOME_ROW[color][target]:
+        return "SB"
+    if IS_HOME_ROW[OPPOSITE_COLOR[color]][target] and PIECE_TYPE[piece] == 1:
+        return "SC"
+    return "S"
+
+
+def transpose_tag(piece, origin, target):
+    """
+    Returns the tag of a transpose of piece from origin with the single
+    at target (see Position.get_transposes).
+    """
+    color = PIECE_COLOR[piece]
+    if IS_HOME_ROW[color][target]:
+        return "TB"
+    if IS_HOME_ROW[OPPOSITE_COLOR[color]][origin]:
+        return "TC"
+    return "T"
+
+
+# The (target, tag) pairs of the slides along each ray of a piece
+SLIDES = {
+    piece: tuple(
+        tuple(
+            tuple((target, slide_tag(piece, target)) for target in ray) for ray in rays
+        )
+        for rays in RAYS[piece]
+    )
+    for piece in RAYS
 }
 
-DIAGONALS = {
-    ((i, j), d): [
-        (i + s * d[0], j + s * d[1])
-        for s in range(1, 8)
-        if 0 <= i + s * d[0] < 8 and 0 <= j + s * d[1] < 8
-    ]
-    for i, j in INITIAL_STATE
-    for checker in MOVE_DIRECTIONS
-    for d in MOVE_DIRECTIONS[checker]
+# The (target, tag) pairs of the transposes of a double with an adjacent single
+TRANSPOSES = {
+    piece: tuple(
+        tuple((ray[0], transpose_tag(piece, origin, ray[0])) for ray in rays if ray)
+        if PIECE_TYPE[piece] == 2
+        else ()
+        for origin, rays in enumerate(RAYS[piece])
+    )
+    for piece in RAYS
 }
 
 # Parameters and weights for evaluation
@@ -49,3 +224,38 @@ CHECKERS_COUNT_WEIGHT = 120
 DOUBLES_PATHS_WEIGHT = 8
 SINGLES_PATHS_WEIGHT = 2
 DOUBLES_WEIGHT = 1
+
+# Tuned parameters and weights (see impasse/tuner.py) replace the ones above
+# if a weights file is present
+EVALUATION_WEIGHTS_FILE = os.path.join(
+    os.path.dirname(__file__), "evaluation_weights.json"
+)
+EVALUATION_WEIGHTS_NAMES = (
+    "DOUBLES_PATHS_MAX",
+    "SINGLES_PATHS_MAX",
+    "CHECKERS_COUNT_WEIGHT",
+    "DOUBLES_PATHS_WEIGHT",
+    "SINGLES_PATHS_WEIGHT",
+    "DOUBLES_WEIGHT",
+)
+
+
+def load_evaluation_weights(path=EVALUATION_WEIGHTS_FILE):
+    """
+    Returns the evaluation parameters and weights stored in the weights file,
+    or an empty dictionary if there is no such file.
+    """
+    if not os.path.exists(path):
+        return {}
+    with open(path) as file:
+        weights = json.load(file)
+    return {name: weights[name] for name in EVALUATION_WEIGHTS_NAMES if name in weights}
+
+
+globals().update(load_evaluation_weights())
+
+# Weights of the network evaluator (see impasse/evaluator.py), which replaces the
+# evaluation formula if the file is present
+EVALUATOR_WEIGHTS_FILE = os.path.join(
+    os.path.dirname(__file__), "evaluator_weights.npz"
+)
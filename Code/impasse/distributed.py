@@ -0,0 +1,415 @@
+"""
+Analysis of large sets of positions by workers on several machines.
+
+A coordinator reads a file of positions (one per line, in the text form of
+Position.to_text) and hands them out over TCP to the workers connected to it, which
+search each position with the AI and send back the result. Messages are JSON
+objects, one per line. Each work item holds the index of a position, its bytes
+encoding (in hex, see Position.to_bytes) and the limits of its search, and each
+worker searches one item at a time.
+
+Workers send a heartbeat every HEARTBEAT_SECONDS (even while searching). A worker
+which is silent for HEARTBEAT_TIMEOUT seconds, or whose connection is lost, is
+dropped and its item is handed to another worker. An item is given up after
+MAX_ATTEMPTS attempts (e.g. if it crashes every worker searching it), and its record
+holds the error.
+
+The coordinator appends one JSON line to the output file per position, as the
+results arrive (so not in order): its index, the position, the value (from the
+point of view of WHITE), the best move and principal variation, the depth and
+nodes searched and the worker which searched it. As with the analysis of games,
+rerunning the same command after an interruption skips the positions already in
+the output file. The coordinator stops once every position has a record.
+
+Usage:
+    python -m impasse.distributed coordinator POSITIONS_FILE OUTPUT_FILE
+        [--host HOST] [--port PORT] [--nodes N] [--movetime MS] [--depth D]
+    python -m impasse.distributed worker HOST [--port PORT] [--processes N]
+"""
+
+import argparse
+import asyncio
+from collections import deque
+import json
+from math import inf
+from multiprocessing import Process
+import os
+import socket
+import threading
+import time
+
+from impasse.ai import *
+from impasse.analysis import ANALYSIS_NODES, analysed_games, read_tasks
+from impasse.constants import *
+from impasse.game_records import *
+from impasse.position import *
+
+COORDINATOR_PORT = 8766
+# Interval between the heartbeats of a worker
+HEARTBEAT_SECONDS = 2
+# Time after which a silent worker is considered lost
+HEARTBEAT_TIMEOUT = 10
+# Number of times an item is handed out before it is given up
+MAX_ATTEMPTS = 3
+# Time for which a worker keeps trying to connect to the coordinator
+CONNECT_SECONDS = 30
+
+
+def send_message(file, message):
+    file.write((json.dumps(message) + "\n").encode())
+
+
+# Workers
+
+
+def search_item(item):
+    """
+    Searches the position of a work item. Returns the result sent to the
+    coordinator. Each item is searched with a new AI, so that (with a node or depth
+    limit) its result does not depend on the items searched before it.
+    """
+    position = Position.from_bytes(bytes.fromhex(item["position"]))
+    result = {"type": "result", "index": item["index"]}
+    if position.winner is not None:
+        return {**result, "value": position.evaluate(), "move": None, "pv": []}
+    ai = AI(position.turn)
+    depth, value, best_move = ai.iterative_deepening(
+        position,
+        max_depth=item["depth"],
+        milliseconds_per_move=item["movetime"] or inf,
+        max_milliseconds_per_move=item["movetime"] or inf,
+        min_search_depth=0,
+        max_nodes=item["nodes"],
+    )
+    return {
+        **result,
+        "value": value,
+        "move": move_to_string(*best_move[:2]),
+        "pv": [move_to_string(*move[:2]) for move in ai.principal_variation],
+        "depth": depth,
+        "nodes": ai.nodes,
+    }
+
+
+def connect(host, port):
+    """
+    Connects to the coordinator, retrying for up to CONNECT_SECONDS (so that workers
+    can be started before the coordinator).
+    """
+    deadline = time.time() + CONNECT_SECONDS
+    while True:
+        try:
+            return socket.create_connection((host, port))
+        except OSError:
+            if time.time() > deadline:
+                raise
+            time.sleep(1)
+
+
+def work(host, port=COORDINATOR_PORT):
+    """
+    Runs a worker: searches the items sent by the coordinator until it is done.
+    """
+    name = f"{socket.gethostname()}:{os.getpid()}"
+    with connect(host, port) as connection:
+        reader = connection.makefile("rb")
+        writer = connection.makefile("wb", buffering=0)
+        lock = threading.Lock()
+        stopped = threading.Event()
+
+        def send(message):
+            with lock:
+                send_message(writer, message)
+
+        def send_heartbeats():
+            while not stopped.wait(HEARTBEAT_SECONDS):
+                try:
+                    send({"type": "heartbeat"})
+                except OSError:
+                    return
+
+        send({"type": "hello", "name": name})
+        heartbeats = threading.Thread(target=send_heartbeats, daemon=True)
+        heartbeats.start()
+        try:
+            for line in reader:
+                message = json.loads(line)
+                if message["type"] == "done":
+                    break
+                try:
+                    result = search_item(message)
+                except Exception as error:
+                    result = {
+                        "type": "error",
+                        "index": message["index"],
+                        "error": repr(error),
+                    }
+                send(result)
+        except OSError:
+            pass
+        finally:
+            stopped.set()
+    print(f"Worker {name} finished")
+
+
+def run_workers(host, port=COORDINATOR_PORT, processes=None):
+    """
+    Runs a worker in each of the given number of processes (one per CPU by default).
+    """
+    workers = [
+        Process(target=work, args=(host, port))
+        for _ in range(processes or os.cpu_count())
+    ]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+
+
+# Coordinator
+
+
+class Worker:
+    """
+    The coordinator's view of a connected worker.
+    """
+
+    def __init__(self, name, writer):
+        self.name = name
+        self.writer = writer
+        # The item being searched by the worker (None if idle)
+        self.item = None
+
+
+class Coordinator:
+    """
+    Hands out the positions of a file to the workers and writes their results.
+    Positions are read lazily, so that memory use does not grow with their number.
+    """
+
+    def __init__(
+        self,
+        positions_path,
+        output_path,
+        nodes=ANALYSIS_NODES,
+        movetime=None,
+        depth=None,
+    ):
+        self.limits = {"nodes": nodes, "movetime": movetime, "depth": depth}
+        self.output_path = output_path
+        self.tasks = read_tasks(positions_path, analysed_games(output_path, "index"))
+        # Items handed back by lost workers, handed out again before new items
+        self.retries = deque()
+        self.attempts = {}
+        self.workers = []
+        # The tasks serving the connected workers
+        self.handlers = set()
+        self.output = None
+        # Set once all the positions of the file have been read
+        self.exhausted = False
+        self.finished = None
+        # Statistics
+        self.results = 0
+        # Number of positions searched by each worker
+        self.completed = {}
+        self.lost_workers = 0
+        self.failed = 0
+
+    def next_item(self):
+        """
+        Returns the next item to hand out (None if there are none left).
+        """
+        if self.retries:
+            return self.retries.popleft()
+        for index, line in self.tasks:
+            try:
+                position = Position.from_text(line)
+            except (ValueError, KeyError):
+                self.write(
+                    {"index": index, "error": f"Invalid position: {line.strip()}"}
+                )
+                self.failed += 1
+                continue
+            return {"index": index, "position": position.to_bytes().hex()}
+        self.exhausted = True
+        return None
+
+    def check_finished(self):
+        """
+        Finishes if every position has been read and searched.
+        """
+        if (
+            self.exhausted
+            and not self.retries
+            and all(worker.item is None for worker in self.workers)
+        ):
+            self.finished.set()
+
+    def assign(self, worker: Worker):
+        """
+        Sends the next item to an idle worker, or finishes if all items are done.
+        """
+        worker.item = self.next_item()
+        if worker.item is None:
+            self.check_finished()
+            return
+        self.attempts[worker.item["index"]] = (
+            self.attempts.get(worker.item["index"], 0) + 1
+        )
+        send_message(worker.writer, {"type": "work", **worker.item, **self.limits})
+
+    def retry(self, item, error):
+        """
+        Hands an item out again (to an idle worker if there is one), or gives it up
+        after MAX_ATTEMPTS attempts.
+        """
+        if self.attempts[item["index"]] >= MAX_ATTEMPTS:
+            self.write({"index": item["index"], "error": error})
+            self.failed += 1
+        else:
+            self.retries.append(item)
+        for worker in self.workers:
+            if worker.item is None:
+                self.assign(worker)
+                if worker.item is None:
+                    break
+        self.check_finished()
+
+    def write(self, record):
+        self.output.write(json.dumps(record) + "\n")
+        self.output.flush()
+
+    def record_result(self, worker: Worker, result):
+        item = worker.item
+        position = Position.from_bytes(bytes.fromhex(item["position"]))
+        self.write(
+            {
+                "index": item["index"],
+                "position": position.to_text(),
+                **{key: value for key, value in result.items() if key != "type"},
+                "worker": worker.name,
+            }
+        )
+        self.results += 1
+        self.completed[worker.name] = self.completed.get(worker.name, 0) + 1
+        print(
+            f"Position {item['index']}: value {result['value']}, best move "
+            f"{result['move']} ({worker.name})"
+        )
+
+    async def handle_worker(self, reader, writer):
+        worker = None
+        self.handlers.add(asyncio.current_task())
+        try:
+            hello = json.loads(await reader.readline())
+            worker = Worker(hello["name"], writer)
+            self.workers.append(worker)
+            print(f"Worker {worker.name} connected")
+            self.assign(worker)
+            while True:
+                line = await asyncio.wait_for(reader.readline(), HEARTBEAT_TIMEOUT)
+                if not line:
+                    raise ConnectionError("connection closed")
+                message = json.loads(line)
+                if message["type"] == "heartbeat" or worker.item is None:
+                    continue
+                if message["index"] != worker.item["index"]:
+                    continue
+                if message["type"] == "result":
+                    self.record_result(worker, message)
+                    self.assign(worker)
+                elif message["type"] == "error":
+                    item, worker.item = worker.item, None
+                    self.retry(item, message["error"])
+                await writer.drain()
+        except (asyncio.TimeoutError, ConnectionError, ValueError, KeyError) as error:
+            if worker is not None and not self.finished.is_set():
+                print(f"Worker {worker.name} lost ({str(error) or 'no heartbeat'})")
+        finally:
+            self.handlers.discard(asyncio.current_task())
+            writer.close()
+            if worker is not None:
+                self.workers.remove(worker)
+                if worker.item is not None:
+                    self.lost_workers += 1
+                    self.retry(worker.item, f"worker {worker.name} lost")
+
+    async def serve(self, host="0.0.0.0", port=COORDINATOR_PORT):
+        """
+        Serves the workers until all positions have a record, then prints the number
+        of positions searched by each worker.
+        """
+        self.finished = asyncio.Event()
+        with open(self.output_path, "a") as self.output:
+            server = await asyncio.start_server(self.handle_worker, host, port)
+            print(f"Coordinating on {host}:{port}", flush=True)
+            async with server:
+                await self.finished.wait()
+                server.close()
+                for worker in self.workers:
+                    send_message(worker.writer, {"type": "done"})
+                # Wait for the workers to disconnect (or to time out)
+                await asyncio.gather(*self.handlers)
+        for name, completed in self.completed.items():
+            print(f"Worker {name}: {completed} positions")
+        print(
+            f"{self.results} positions searched, {self.failed} failed, "
+            f"{self.lost_workers} workers lost"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Analyse positions with workers on several machines."
+    )
+    subparsers = parser.add_subparsers(dest="role", required=True)
+    coordinator = subparsers.add_parser("coordinator")
+    coordinator.add_argument("positions", help="file of positions (one per line)")
+    coordinator.add_argument(
+        "output", help="file the results are appended to (JSON lines)"
+    )
+    coordinator.add_argument("--host", default="0.0.0.0")
+    coordinator.add_argument("--port", type=int, default=COORDINATOR_PORT)
+    coordinator.add_argument(
+        "--nodes",
+        type=int,
+        default=ANALYSIS_NODES,
+        help="number of nodes searched per position",
+    )
+    coordinator.add_argument(
+        "--movetime",
+        type=int,
+        default=None,
+        metavar="MS",
+        help="time limit per position (use --nodes 0 to search by time only)",
+    )
+    coordinator.add_argument("--depth", type=int, default=None)
+    worker = subparsers.add_parser("worker")
+    worker.add_argument("host", help="host of the coordinator")
+    worker.add_argument("--port", type=int, default=COORDINATOR_PORT)
+    worker.add_argument("--processes", type=int, default=None)
+    args = parser.parse_args()
+    if (
+        args.role == "coordinator"
+        and not args.nodes
+        and not args.movetime
+        and not args.depth
+    ):
+        parser.error("--nodes 0 requires --movetime or --depth")
+
+    if args.role == "coordinator":
+        asyncio.run(
+            Coordinator(
+                args.positions,
+                args.output,
+                args.nodes or None,
+                args.movetime,
+                args.depth,
+            ).serve(args.host, args.port)
+        )
+    else:
+        run_workers(args.host, args.port, args.processes)
+
+
+if __name__ == "__main__":
+    main()
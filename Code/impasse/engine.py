@@ -0,0 +1,250 @@
+import sys
+import threading
+
+from impasse.ai import *
+from impasse.constants import *
+from impasse.game_records import *
+from impasse.position import *
+
+ENGINE_NAME = "Impasse"
+# Expected number of moves left in the game when playing on a clock
+MOVES_TO_GO = 30
+
+
+class Engine:
+    """
+    A headless engine speaking a line based text protocol (modelled on UCI), so that
+    the AI can be driven by other programs over stdin/stdout. The commands are:
+    - uci: prints the engine's name followed by "uciok"
+    - isready: prints "readyok" (once any running search has been set up)
+    - ucinewgame: starts a new game with an empty transposition table
+    - position startpos [moves M1 M2 ...]
+    - position fen BOARD TURN PHASE [moves M1 M2 ...]: sets up the position given in
+      text form (see Position.to_text) and plays the given moves (in compact notation)
+    - go [depth N] [nodes N] [movetime MS] [wtime MS] [btime MS] [winc MS] [binc MS]
+      [movestogo N] [infinite] [multipv K]: searches the current position in the
+      background (for the K best moves if multipv is given)
+    - stop: stops the search
+    - quit
+    Commands other than "isready", "stop" and "quit" wait for a running search to
+    finish (and stop a "go infinite" search, which only finishes when stopped).
+    While searching, the engine prints a line
+    "info depth D seldepth SD score S nodes N nps N time MS pv M1 M2 ..." after each
+    completed depth (one for each of the K best moves, with "multipv I" after the
+    selective depth, in multi PV mode), where the selective depth is the largest ply
+    reached (moves followed by crownings are extended, see AI.child_depth) and the
+    score is given from the point of view of the side to move, and finally
+    "bestmove M" (for "go infinite", only once "stop" is received, even if the search
+    ended by itself).
+    """
+
+    def __init__(self, output=sys.stdout):
+        self.output = output
+        self.output_lock = threading.Lock()
+        self.position = Position()
+        self.ai = AI(self.position.turn)
+        self.search_thread = None
+        # Whether the running search is infinite, and set when it is stopped
+        self.infinite = False
+        self.stopped = threading.Event()
+
+    def send(self, line):
+        with self.output_lock:
+            print(line, file=self.output, flush=True)
+
+    def run(self, input=sys.stdin):
+        """
+        Reads and executes commands until "quit" or the end of the input.
+        """
+        for line in input:
+            if not self.execute(line):
+                self.stop()
+                return
+        self.wait()
+
+    def execute(self, line):
+        """
+        Executes a command. Returns False if the engine should quit.
+        """
+        command, *arguments = line.split() or [""]
+        if command == "quit":
+            return False
+        elif command == "uci":
+            self.send(f"id name {ENGINE_NAME}")
+            self.send("uciok")
+        elif command == "isready":
+            self.send("readyok")
+        elif command == "ucinewgame":
+            self.wait()
+            self.ai = AI(self.position.turn)
+        elif command == "position":
+            self.wait()
+            try:
+                self.set_position(arguments)
+            except (ValueError, IndexError) as error:
+                self.send(f"info string {error}")
+        elif command == "go":
+            self.wait()
+            self.go(arguments)
+        elif command == "stop":
+            self.stop()
+        elif command:
+            self.send(f"info string Unknown command: {command}")
+        return True
+
+    def set_position(self, arguments):
+        """
+        Sets up the position described by the arguments of a "position" command.
+        """
+        if "moves" in arguments:
+            split = arguments.index("moves")
+            arguments, move_strings = arguments[:split], arguments[split + 1 :]
+        else:
+            move_strings = []
+        if arguments[0] == "startpos":
+            position = Position()
+        elif arguments[0] == "fen":
+            position = Position.from_text(" ".join(arguments[1:]))
+        else:
+            raise ValueError(f"Unknown position type: {arguments[0]}")
+        for move_string in move_strings:
+            if position.winner is not None:
+                raise ValueError(f"Move after the end of the game: {move_string}")
+            position = position.new_position_after_move(
+                *string_to_move(position, move_string)
+            )
+        self.position = position
+
+    def search_limits(self, arguments):
+        """
+        Returns the keyword arguments of AI.iterative_deepening for the arguments
+        of a "go" command.
+        """
+        if "infinite" in arguments:
+            arguments.remove("infinite")
+            infinite = True
+        else:
+            infinite = False
+        options = dict(zip(arguments[::2], arguments[1::2]))
+        limits = {}
+        if "multipv" in options:
+            limits["k"] = int(options["multipv"])
+            if limits["k"] <= 0:
+                raise ValueError(f"Invalid multipv: {options['multipv']}")
+        if infinite:
+            limits["milliseconds_per_move"] = inf
+            limits["max_milliseconds_per_move"] = inf
+            return limits
+        for option, limit in (("depth", "max_depth"), ("nodes", "max_nodes")):
+            if option in options:
+                limits[limit] = int(options[option])
+                if limits[limit] <= 0:
+                    raise ValueError(f"Invalid {option}: {options[option]}")
+        clock = {WHITE: "wtime", BLACK: "btime"}[self.position.turn]
+        increment = {WHITE: "winc", BLACK: "binc"}[self.position.turn]
+        for option in ("movetime", "wtime", "btime", "winc", "binc"):
+            if int(options.get(option, 0)) < 0:
+                raise ValueError(f"Invalid {option}: {options[option]}")
+        if int(options.get("movestogo", 1)) <= 0:
+            raise ValueError(f"Invalid movestogo: {options['movestogo']}")
+        if "movetime" in options:
+            move_time = int(options["movetime"])
+            limits["milliseconds_per_move"] = move_time
+            limits["max_milliseconds_per_move"] = move_time
+            limits["min_search_depth"] = 0
+        elif clock in options:
+            time_left = int(options[clock])
+            moves_to_go = int(options.get("movestogo", MOVES_TO_GO))
+            move_time = time_left // moves_to_go + int(options.get(increment, 0))
+            limits["milliseconds_per_move"] = move_time
+            limits["max_milliseconds_per_move"] = min(3 * move_time, time_left // 2)
+            limits["min_search_depth"] = 0
+        elif limits:
+            # Search only up to the given depth or nodes
+            limits["milliseconds_per_move"] = inf
+            limits["max_milliseconds_per_move"] = inf
+        return limits
+
+    def go(self, arguments):
+        """
+        Starts searching the current position in a background thread.
+        """
+        self.infinite = "infinite" in arguments
+        try:
+            limits = self.search_limits(arguments)
+        except ValueError as error:
+            self.send(f"info string {error}")
+            return
+        self.stopped.clear()
+        self.search_thread = threading.Thread(
+            target=self.search, args=(self.position, limits), daemon=True
+        )
+        self.search_thread.start()
+
+    def search(self, position: Position, limits):
+        if position.winner is not None:
+            self.send_best_move("none")
+            return
+        sign = 1 if position.turn == WHITE else -1
+
+        def send_info(depth, value, nodes, move_time, principal_variation, rank=None):
+            self.send(
+                f"info depth {depth} seldepth {self.ai.selective_depth} "
+                + (f"multipv {rank} " if rank else "")
+                + f"score {sign * value} nodes {nodes} "
+                f"nps {1000 * nodes // max(move_time, 1)} time {move_time} pv "
+                + " ".join(move_to_string(*move[:2]) for move in principal_variation)
+            )
+
+        def multi_pv_info(depth, nodes, move_time, results):
+            for rank, (value, _, principal_variation) in enumerate(results, 1):
+                send_info(depth, value, nodes, move_time, principal_variation, rank)
+
+        if "k" in limits:
+            results = self.ai.multi_pv(position, info=multi_pv_info, **limits)
+            _, (origin, target, _), _ = results[0]
+        else:
+            _, _, (origin, target, _) = self.ai.iterative_deepening(
+                position, info=send_info, **limits
+            )
+        self.send_best_move(move_to_string(origin, target))
+
+    def send_best_move(self, move_string):
+        """
+        Sends the best move of a search (after waiting for "stop" if it is infinite).
+        """
+        if self.infinite:
+            self.stopped.wait()
+        self.send(f"bestmove {move_string}")
+
+    def wait(self):
+        """
+        Waits for the running search (if any) to finish, stopping it if it is
+        infinite.
+        """
+        if self.search_thread:
+            if self.infinite:
+                self.stop()
+                return
+            self.search_thread.join()
+            self.search_thread = None
+
+    def stop(self):
+        """
+        Stops the running search (if any) and waits for its best move.
+        """
+        if self.search_thread:
+            self.ai.stop()
+            self.stopped.set()
+            self.search_thread.join()
+            self.search_thread = None
+            # The search may have finished before it was stopped
+            self.ai.stop_requested = False
+
+
+def main():
+    Engine().run()
+
+
+if __name__ == "__main__":
+    main()
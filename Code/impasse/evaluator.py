@@ -0,0 +1,140 @@
+"""
+A small neural network evaluator (in the style of NNUE) which can replace the
+evaluation formula of Position.evaluate. Requires numpy.
+
+The input features are the (square, piece) pairs of the board. They go through
+one hidden layer, the feature transformer, whose output (the accumulator) is kept
+by each position and updated from the state_update of each move, so evaluating a
+position costs a clipped dot product rather than searching for paths. The board
+is seen from both perspectives: the accumulator holds one row for the position
+and one for its mirrored position (see MIRRORED_SQUARE), and the evaluation is the
+difference of their outputs. This makes the evaluation of the mirrored position
+exactly the negation of the evaluation of the position, as the TT expects.
+
+The weights are trained offline by the tuner (python -m impasse.tuner GAMES_FILE
+--evaluator) and, if the weights file is present, loaded at startup.
+"""
+
+import numpy as np
+
+from impasse.constants import *
+
+# Number of input features: one for each (square, non-empty piece) pair
+FEATURES = len(SQUARES) * len(PIECES)
+# Size of the hidden layer (the accumulator)
+HIDDEN_SIZE = 32
+# The weights of the feature transformer are stored as int16, multiplied by this
+# scale, so that the clipped ReLU of the hidden layer clips at HIDDEN_SCALE
+HIDDEN_SCALE = 64
+
+
+def feature_index(square, piece):
+    return len(PIECES) * square + piece - 1
+
+
+def feature_indices(state):
+    """
+    Returns the indices of the active features of a state, for both perspectives.
+    """
+    return (
+        [feature_index(square, piece) for square, piece in enumerate(state) if piece],
+        [
+            feature_index(MIRRORED_SQUARE[square], MIRRORED_PIECE[piece])
+            for square, piece in enumerate(state)
+            if piece
+        ],
+    )
+
+
+class Evaluator:
+    """
+    The quantised network: the feature transformer (with weights and biases scaled
+    by HIDDEN_SCALE) and the output weights (in units of the evaluation).
+    """
+
+    def __init__(self, hidden_weights, hidden_biases, output_weights):
+        self.hidden_biases = np.asarray(hidden_biases, dtype=np.int16)
+        self.output_weights = np.asarray(output_weights, dtype=np.int32)
+        hidden_weights = np.asarray(hidden_weights, dtype=np.int16)
+        # The change of the accumulator (for both perspectives) caused by each
+        # piece on each square, indexed by square and by piece
+        self.piece_weights = [
+            [np.zeros((2, len(self.hidden_biases)), dtype=np.int16)]
+            + [
+                np.stack(
+                    (
+                        hidden_weights[feature_index(square, piece)],
+                        hidden_weights[
+                            feature_index(
+                                MIRRORED_SQUARE[square], MIRRORED_PIECE[piece]
+                            )
+                        ],
+                    )
+                )
+                for piece in PIECES
+            ]
+            for square in range(len(SQUARES))
+        ]
+
+    @classmethod
+    def from_float(cls, hidden_weights, hidden_biases, output_weights):
+        """
+        Returns the evaluator quantising the weights of a trained network.
+        """
+        limit = np.iinfo(np.int16).max // len(SQUARES)
+        return cls(
+            np.clip(np.round(HIDDEN_SCALE * hidden_weights), -limit, limit),
+            np.clip(np.round(HIDDEN_SCALE * hidden_biases), -limit, limit),
+            np.round(output_weights),
+        )
+
+    @classmethod
+    def load(cls, path=EVALUATOR_WEIGHTS_FILE):
+        with np.load(path) as weights:
+            return cls(
+                weights["hidden_weights"],
+                weights["hidden_biases"],
+                weights["output_weights"],
+            )
+
+    def save(self, path=EVALUATOR_WEIGHTS_FILE):
+        hidden_weights = np.zeros((FEATURES, len(self.hidden_biases)), dtype=np.int16)
+        for square in range(len(SQUARES)):
+            for piece in PIECES:
+                hidden_weights[feature_index(square, piece)] = self.piece_weights[
+                    square
+                ][piece][0]
+        # Use a file object so that numpy does not append ".npz" to the path
+        with open(path, "wb") as file:
+            np.savez(
+                file,
+                hidden_weights=hidden_weights,
+                hidden_biases=self.hidden_biases,
+                output_weights=self.output_weights,
+            )
+
+    def accumulator(self, state):
+        """
+        Returns the accumulator of a state, computed from scratch.
+        """
+        accumulator = np.stack((self.hidden_biases, self.hidden_biases))
+        for square, piece in enumerate(state):
+            accumulator += self.piece_weights[square][piece]
+        return accumulator
+
+    def update(self, accumulator, square, old_piece, piece):
+        """
+        Updates an accumulator in place for a square whose piece changed.
+        """
+        accumulator += self.piece_weights[square][piece]
+        accumulator -= self.piece_weights[square][old_piece]
+
+    def evaluate(self, accumulator):
+        """
+        Returns the evaluation (from the point of view of WHITE) of the position
+        with the given accumulator.
+        """
+        hidden = np.clip(accumulator, 0, HIDDEN_SCALE)
+        return round(
+            int(np.dot(hidden[0] - hidden[1], self.output_weights)) / HIDDEN_SCALE
+        )
@@ -0,0 +1,70 @@
+from impasse.constants import *
+from impasse.position import *
+
+# Game results as written at the end of each game record
+RESULTS = {"1-0": WHITE, "0-1": BLACK, "*": None}
+RESULT_STRINGS = {winner: result for result, winner in RESULTS.items()}
+
+
+def move_to_string(origin, target):
+    """
+    Returns the compact notation of a move, i.e. the names of its origin and target
+    squares (e.g. "C3D4"), or only the name of its origin square for bear offs (e.g.
+    "C3"). The tag of the move is not needed, since it is determined by the position.
+    """
+    return square_to_string(origin) + (square_to_string(target) or "")
+
+
+def string_to_move(position: Position, move_string):
+    """
+    Returns the move (origin, target, tag) of the position described by move_string.
+    Raises a ValueError if there is no such legal move.
+    """
+    try:
+        origin = string_to_square(move_string[:2])
+        target = string_to_square(move_string[2:4])
+        tag = position.all_legal_moves[origin][target]
+    except KeyError:
+        raise ValueError(f"Illegal move: {move_string}") from None
+    return origin, target, tag
+
+
+def parse_game(line):
+    """
+    Parses a game record, i.e. a line of space separated moves followed by the result
+    of the game ("1-0" if WHITE won, "0-1" if BLACK won, "*" if the game is unfinished).
+    Returns the list of moves (in compact notation) and the winner.
+    """
+    *move_strings, result = line.split()
+    return move_strings, RESULTS[result]
+
+
+def game_to_string(move_strings, winner):
+    """
+    Returns the game record of a game given its moves (in compact notation)
+    and its winner.
+    """
+    return " ".join(move_strings + [RESULT_STRINGS[winner]])
+
+
+def read_games(path):
+    """
+    Yields the moves and the winner of each game stored in a file of game records
+    (one game per line, blank lines and lines starting with "#" are ignored).
+    """
+    with open(path) as file:
+        for line in file:
+            if line.strip() and not line.startswith("#"):
+                yield parse_game(line)
+
+
+def replay(move_strings):
+    """
+    Replays a game from the starting position. Yields each position reached
+    along with the move played in it.
+    """
+    position = Position()
+    for move_string in move_strings:
+        move = string_to_move(position, move_string)
+        yield position, move
+        position = position.new_position_after_move(*move)
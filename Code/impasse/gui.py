@@ -12,7 +12,11 @@ class GUI(Position):
     A GUI wrapper running on top of the Position class to play the game graphically.
     """
 
-    def __init__(self, window: pg.Surface, secs=None, ai_player=None):
+    def __init__(self, window: pg.Surface, secs=None, ai_player=None, tt_path=None):
+        """
+        If tt_path is given, the AI player starts with the transposition table saved
+        in that file (if any) and saves its transposition table there at the end.
+        """
         pg.init()
         self.window = window
         self.timed = True if secs and not ai_player else False
@@ -20,6 +24,8 @@ class GUI(Position):
             "info": pg.font.SysFont("georgia", 24),
             "cell": pg.font.SysFont("georgia", 14),
         }
+        self.tt_path = tt_path
+        self.ai_player = None
         self.new_game(secs, ai_player)
 
     def new_game(self, secs, ai_player):
@@ -27,14 +33,16 @@ class GUI(Position):
         Creates a new game from the starting position.
         """
         self.make_position()
-        self.last_move_data = {"cells": [], "color": None, "tag": None}
+        self.last_move_data = {"squares": [], "color": None, "tag": None}
         self.undo_activated = False
         self.times = {WHITE: secs, BLACK: secs}
         self.export_position_data()
         self.selection_activated = True
         self.selected = None
         self.show_cells = True
-        self.ai_player = AI(ai_player) if ai_player else None
+        # Keep the AI (along with its transposition table) across games
+        if not (self.ai_player and self.ai_player.color == ai_player):
+            self.ai_player = AI(ai_player, self.tt_path) if ai_player else None
         self.print_intro_message()
         if ai_player == WHITE:
             self.ai_play_turn_full()
@@ -52,10 +60,7 @@ class GUI(Position):
         Saves the position data in an external file for recovery.
         """
         position_data = {
-            "state": self.state,
-            "turn": self.turn,
-            "all_legal_moves": self.all_legal_moves,
-            "checkers_total": self.checkers_total,
+            "position": self.to_bytes(),
             "winner": self.winner,
             "last_move_data": self.last_move_data,
             "undo_activated": self.undo_activated,
@@ -77,10 +82,17 @@ class GUI(Position):
                 "rb",
             )
         )
-        self.state = position_data["state"]
-        self.turn = position_data["turn"]
-        self.all_legal_moves = position_data["all_legal_moves"]
-        self.checkers_total = position_data["checkers_total"]
+        position = Position.from_bytes(position_data["position"])
+        self.state = position.state
+        self.turn = position.turn
+        self.all_legal_moves = position.all_legal_moves
+        self.checkers_total = position.checkers_total
+        self.state_hash = position.state_hash
+        self.mirror_hash = position.mirror_hash
+        self.checker_moves = position.checker_moves
+        self.stale_squares = position.stale_squares
+        self.evaluator = position.evaluator
+        self.accumulator = position.accumulator
         self.winner = position_data["winner"]
         self.last_move_data = position_data["last_move_data"]
         self.undo_activated = position_data["undo_activated"]
@@ -88,6 +100,13 @@ class GUI(Position):
         self.selection_activated = False if self.winner else True
         self.selected = None
 
+    def save_transposition_table(self):
+        """
+        Saves the transposition table of the AI player for future sessions.
+        """
+        if self.ai_player and self.tt_path:
+            self.ai_player.save_transposition_table(self.tt_path)
+
     def update_time(self):
         """
         Updates the time left for each player (called every second from the main loop).
@@ -121,16 +140,18 @@ class GUI(Position):
     def change_show_cells(self):
         self.show_cells = not self.show_cells
 
-    def draw_checker(self, cell):
+    def draw_checker(self, square):
         """
         Draws the checkers on the board.
         """
-        x, y = calculate_coords(cell)
-        color, type = self.state[cell]
-        pg.draw.circle(self.window, color, (x, y), RADIUS)
-        if type == 2:
-            pg.draw.circle(self.window, OPPOSITE_COLOR[color], (x, y), 2 * RADIUS / 3)
-            pg.draw.circle(self.window, color, (x, y), RADIUS / 2)
+        x, y = calculate_coords(SQUARES[square])
+        color = PIECE_COLOR[self.state[square]]
+        pg.draw.circle(self.window, RGB[color], (x, y), RADIUS)
+        if PIECE_TYPE[self.state[square]] == 2:
+            pg.draw.circle(
+                self.window, RGB[OPPOSITE_COLOR[color]], (x, y), 2 * RADIUS / 3
+            )
+            pg.draw.circle(self.window, RGB[color], (x, y), RADIUS / 2)
 
     def draw_board(self):
         """
@@ -140,8 +161,8 @@ class GUI(Position):
             for j in range(8):
                 if (i + j) % 2 == 0:
                     pg.draw.rect(self.window, DARK, square_draw_tuple((i, j)))
-                    if self.is_occupied((i, j)):
-                        self.draw_checker((i, j))
+                    if self.is_occupied(SQUARE_INDEX[(i, j)]):
+                        self.draw_checker(SQUARE_INDEX[(i, j)])
                 else:
                     pg.draw.rect(self.window, LIGHT, square_draw_tuple((i, j)))
 
@@ -154,7 +175,9 @@ class GUI(Position):
 
     def make_last_move_string(self):
         return (
-            " to ".join(cell_to_string(cell) for cell in self.last_move_data["cells"])
+            " to ".join(
+                square_to_string(square) for square in self.last_move_data["squares"]
+            )
             + f" ({self.last_move_data['tag']})"
         )
 
@@ -162,7 +185,7 @@ class GUI(Position):
         """
         Makes the info box for each player.
         """
-        pg.draw.rect(self.window, color, info_box_draw_tuple(color))
+        pg.draw.rect(self.window, RGB[color], info_box_draw_tuple(color))
         checkers = self.checkers_total[color]
         # Checkers count
         if checkers and (
@@ -171,7 +194,7 @@ class GUI(Position):
             checkers_num = self.fonts["info"].render(
                 f"{COLOR_NAME[color]}: {checkers}",
                 True,
-                OPPOSITE_COLOR[color],
+                RGB[OPPOSITE_COLOR[color]],
             )
             self.window.blit(checkers_num, (WIDTH, INFO_HEIGHT_PLACEMENT[color]))
         # Time
@@ -179,7 +202,7 @@ class GUI(Position):
             time = self.fonts["info"].render(
                 self.make_time_string(self.times[color]),
                 True,
-                OPPOSITE_COLOR[color],
+                RGB[OPPOSITE_COLOR[color]],
             )
             self.window.blit(
                 time,
@@ -191,7 +214,7 @@ class GUI(Position):
         # Last move
         if self.last_move_data["color"] == color:
             last_move = self.fonts["info"].render(
-                self.make_last_move_string(), True, OPPOSITE_COLOR[color]
+                self.make_last_move_string(), True, RGB[OPPOSITE_COLOR[color]]
             )
             self.window.blit(
                 last_move,
@@ -213,7 +236,7 @@ class GUI(Position):
         img = self.fonts["info"].render(
             f"{COLOR_NAME[self.winner]} WINS!!!",
             True,
-            OPPOSITE_COLOR[self.winner],
+            RGB[OPPOSITE_COLOR[self.winner]],
         )
         self.window.blit(img, (WIDTH, INFO_HEIGHT_PLACEMENT[self.winner]))
 
@@ -221,28 +244,28 @@ class GUI(Position):
         self.make_info_box(WHITE)
         self.make_info_box(BLACK)
 
-    def highlight(self, cell, color):
-        x, y = calculate_coords(cell)
+    def highlight(self, square, color):
+        x, y = calculate_coords(SQUARES[square])
         pg.draw.circle(self.window, color, (x, y), SQUARE_SIZE // 8)
 
     def show_checkers_that_can_move(self):
         if not (self.ai_player and self.turn == self.ai_player.color):
-            for cell in self.all_legal_moves:
-                self.highlight(cell, ORANGE)
+            for square in self.all_legal_moves:
+                self.highlight(square, ORANGE)
 
     def show_legal_moves_for_selected(self):
-        if self.selected:
+        if self.selected is not None:
             for move in self.all_legal_moves[self.selected]:
-                if move:
+                if move is not None:
                     self.highlight(move, BLUE)
 
     def show_selected(self):
-        if self.selected:
+        if self.selected is not None:
             self.highlight(self.selected, RED)
 
     def show_last_move(self):
-        for cell in self.last_move_data["cells"]:
-            self.highlight(cell, YELLOW)
+        for square in self.last_move_data["squares"]:
+            self.highlight(square, YELLOW)
 
     # Gameplay functions
 
@@ -253,25 +276,27 @@ class GUI(Position):
         """
         if not self.selection_activated:
             return
-        if last_selected := self.selected:
+        # Light cells have no square
+        square = SQUARE_INDEX.get(cell)
+        if (last_selected := self.selected) is not None:
             # If there is a selected cell already, then that cell contains a checker
             # that can be moved on the board. If moving to the newly selected cell is
             # legal, then move. Otherwise, unselect the previous cell and try to select
             # the new one.
             self.selected = None
-            if cell in self.all_legal_moves[last_selected]:
-                tag = self.all_legal_moves[last_selected][cell]
-                self.complete_move(last_selected, cell, tag)
+            if square is not None and square in self.all_legal_moves[last_selected]:
+                tag = self.all_legal_moves[last_selected][square]
+                self.complete_move(last_selected, square, tag)
             else:
                 self.select(cell)
         # Check if the cell contains a checker that can be moved
-        elif cell in self.all_legal_moves:
+        elif square in self.all_legal_moves:
             # Bear off
-            if self.all_legal_moves[cell].get(None) == "B":
-                self.complete_move(cell, None, "B")
+            if self.all_legal_moves[square].get(None) == "B":
+                self.complete_move(square, None, "B")
             # Select cell
             else:
-                self.selected = cell
+                self.selected = square
 
     def complete_move(self, origin, target, tag):
         """
@@ -283,7 +308,7 @@ class GUI(Position):
             self.export_position_data()
         state_update = self.apply_move(origin, target, tag)
         self.last_move_data = {
-            "cells": list(state_update),
+            "squares": list(state_update),
             "color": self.turn,
             "tag": tag,
         }
@@ -327,7 +352,9 @@ class GUI(Position):
         origin, target, tag, unique_move = self.ai_player.suggested_move(self)
         self.complete_move(origin, target, tag)
         print("Best move:", self.make_last_move_string())
-        print(f"Evaluation after move: {self.evaluate()}")
+        print(
+            f"Evaluation after move: {self.ai_player.evaluation_cache.evaluate(self)}"
+        )
         print()
         if unique_move:
             pg.time.wait(500)
@@ -341,7 +368,7 @@ class GUI(Position):
         Plays a full turn for the AI while also printing the evaluation
         of the position before the AI starts thinking.
         """
-        print(f"Current evaluation: {self.evaluate()}")
+        print(f"Current evaluation: {self.ai_player.evaluation_cache.evaluate(self)}")
         print()
         self.ai_play_turn()
         print("--------------------------------------------------")
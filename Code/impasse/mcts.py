@@ -0,0 +1,244 @@
+from math import exp, log, sqrt
+from multiprocessing import Pool
+import random
+import time
+
+from impasse.constants import *
+from impasse.game_records import *
+from impasse.position import *
+
+
+class Node:
+    """
+    A node of the search tree, holding the position reached by its move along with
+    the number of playouts through it and the sum of their results for the player
+    who played the move.
+    """
+
+    __slots__ = (
+        "position",
+        "move",
+        "parent",
+        "children",
+        "untried_moves",
+        "visits",
+        "wins",
+    )
+
+    def __init__(self, position: Position, move=None, parent=None):
+        self.position = position
+        self.move = move
+        self.parent = parent
+        self.children = []
+        self.untried_moves = (
+            []
+            if position.winner is not None
+            else [
+                (origin, target, tag)
+                for origin, targets in position.all_legal_moves.items()
+                for target, tag in targets.items()
+            ]
+        )
+        self.visits = 0
+        self.wins = 0.0
+
+    def select_child(self):
+        """
+        Returns the child with the highest UCT score.
+        """
+        log_visits = log(self.visits)
+        return max(
+            self.children,
+            key=lambda child: child.wins / child.visits
+            + UCT_EXPLORATION * sqrt(log_visits / child.visits),
+        )
+
+    def expand(self, rng: random.Random):
+        """
+        Adds the child of a randomly chosen untried move and returns it.
+        """
+        move = self.untried_moves.pop(rng.randrange(len(self.untried_moves)))
+        child = Node(self.position.new_position_after_move(*move), move, self)
+        self.children.append(child)
+        return child
+
+
+def playout(position: Position, rng: random.Random):
+    """
+    Plays PLAYOUT_MOVES random moves from the position (or until the game ends).
+    Returns the probability that WHITE wins: the result of the game if it ended,
+    or else the probability given by the evaluation of the last position.
+    """
+    for _ in range(PLAYOUT_MOVES):
+        if position.winner is not None:
+            return 1.0 if position.winner == WHITE else 0.0
+        origin = rng.choice(list(position.all_legal_moves))
+        target = rng.choice(list(position.all_legal_moves[origin]))
+        tag = position.all_legal_moves[origin][target]
+        position = position.new_position_after_move(origin, target, tag)
+    if position.winner is not None:
+        return 1.0 if position.winner == WHITE else 0.0
+    return 1 / (1 + exp(-PLAYOUT_EVALUATION_SCALE * position.evaluate()))
+
+
+def search(root: Node, deadline, rng: random.Random, max_playouts=None):
+    """
+    Runs playouts from the root until the deadline (in seconds since the epoch) or
+    until max_playouts playouts have been run. Returns the number of playouts.
+    """
+    playouts = 0
+    while time.time() < deadline and (max_playouts is None or playouts < max_playouts):
+        node = root
+        # Selection
+        while not node.untried_moves and node.children:
+            node = node.select_child()
+        # Expansion
+        if node.untried_moves:
+            node = node.expand(rng)
+        # Simulation and backpropagation
+        white_wins = playout(node.position, rng)
+        while node is not None:
+            node.visits += 1
+            if node.move is not None:
+                mover = node.parent.position.turn
+                node.wins += white_wins if mover == WHITE else 1 - white_wins
+            node = node.parent
+        playouts += 1
+    return playouts
+
+
+def root_statistics(task):
+    """
+    Searches a position (given by its bytes encoding) with a new tree for a number of
+    milliseconds. Returns the visits and wins of each root move. Used by the worker
+    processes of root parallel searches.
+    """
+    position_bytes, search_milliseconds, seed = task
+    root = Node(Position.from_bytes(position_bytes))
+    search(root, time.time() + search_milliseconds / 1000, random.Random(seed))
+    return {child.move: (child.visits, child.wins) for child in root.children}
+
+
+class MCTSAI:
+    """
+    An AI player using Monte Carlo tree search (UCT) with evaluation cutoff playouts,
+    as an alternative to the alpha-beta search of AI with the same interface. The tree
+    is kept between moves, and with processes > 1 the search is root parallel: each
+    worker process searches the same position with its own tree, and the statistics
+    of the root moves of all the trees are added up.
+    """
+
+    def __init__(
+        self,
+        color,
+        milliseconds_per_move=MILLISECONDS_PER_MOVE,
+        processes=1,
+        seed=None,
+    ):
+        self.color = color
+        self.milliseconds_per_move = milliseconds_per_move
+        self.processes = processes
+        self.rng = random.Random(seed)
+        self.pool = Pool(processes - 1) if processes > 1 else None
+        self.root = None
+
+    def close(self):
+        """
+        Stops the worker processes (if any).
+        """
+        if self.pool:
+            self.pool.terminate()
+            self.pool = None
+
+    def find_root(self, position: Position, max_plies=4):
+        """
+        Returns the node of the position in the kept tree (searching at most max_plies
+        below its root), or a new node if it is not found.
+        """
+        nodes = [self.root] if self.root else []
+        for _ in range(max_plies + 1):
+            for node in nodes:
+                if (
+                    node.position.state_hash == position.state_hash
+                    and node.position.state == position.state
+                ):
+                    node.parent = None
+                    node.move = None
+                    return node
+            nodes = [child for node in nodes for child in node.children]
+        return Node(position.copy())
+
+    def best_moves(self, position: Position, max_playouts=None):
+        """
+        Searches the position and returns the statistics of its moves, i.e. a list of
+        (visits, wins, move) ordered from the most to the least visited move, along
+        with the number of playouts run.
+        """
+        self.root = self.find_root(position)
+        if self.pool:
+            workers = self.pool.map_async(
+                root_statistics,
+                [
+                    (
+                        position.to_bytes(),
+                        self.milliseconds_per_move,
+                        self.rng.getrandbits(32),
+                    )
+                    for _ in range(self.processes - 1)
+                ],
+            )
+        playouts = search(
+            self.root,
+            time.time() + self.milliseconds_per_move / 1000,
+            self.rng,
+            max_playouts,
+        )
+        statistics = {
+            child.move: [child.visits, child.wins] for child in self.root.children
+        }
+        if self.pool:
+            for worker_statistics in workers.get():
+                for move, (visits, wins) in worker_statistics.items():
+                    playouts += visits
+                    move_statistics = statistics.setdefault(move, [0, 0.0])
+                    move_statistics[0] += visits
+                    move_statistics[1] += wins
+        return (
+            sorted(
+                ((visits, wins, move) for move, (visits, wins) in statistics.items()),
+                key=lambda move_statistics: move_statistics[0],
+                reverse=True,
+            ),
+            playouts,
+        )
+
+    def suggested_move(self, position: Position):
+        """
+        Returns the most visited move, along with whether it was the only legal move,
+        and prints the estimated win probability of the player to move. The tree below
+        the move is kept for the next search.
+        """
+        moves = [
+            (origin, target, tag)
+            for origin, targets in position.all_legal_moves.items()
+            for target, tag in targets.items()
+        ]
+        if len(moves) == 1:
+            print("MCTS: one legal move")
+            self.root = None
+            return (*moves[0], True)
+        statistics, playouts = self.best_moves(position)
+        if not statistics:
+            # The time ran out before the root was expanded
+            print("MCTS: no playouts, playing a random move")
+            self.root = None
+            return (*self.rng.choice(moves), False)
+        visits, wins, move = statistics[0]
+        print(
+            f"MCTS: win probability {wins / visits:.3f} for {move_to_string(*move[:2])}"
+            f" after {playouts} playouts"
+        )
+        self.root = next(
+            (child for child in self.root.children if child.move == move), None
+        )
+        return (*move, False)
@@ -1,5 +1,29 @@
+import os
+
 from impasse.constants import *
 
+# The network evaluator used instead of the evaluation formula, if any
+evaluator = None
+
+
+def set_evaluator(new_evaluator):
+    """
+    Makes Position.evaluate use an Evaluator (see impasse/evaluator.py), or the
+    evaluation formula if new_evaluator is None. Each position keeps the evaluator
+    in use when it was created (along with its accumulator) and passes it on to the
+    positions derived from it, so only the positions created afterwards (and the
+    positions derived from them) use the new evaluator, and the existing ones keep
+    working with the old one.
+    """
+    global evaluator
+    evaluator = new_evaluator
+
+
+if os.path.exists(EVALUATOR_WEIGHTS_FILE):
+    from impasse.evaluator import Evaluator
+
+    set_evaluator(Evaluator.load(EVALUATOR_WEIGHTS_FILE))
+
 
 class Position:
     """
@@ -7,6 +31,20 @@ class Position:
     and to calculate the effect of a move on a position.
     """
 
+    __slots__ = (
+        "state",
+        "turn",
+        "checkers_total",
+        "winner",
+        "state_hash",
+        "mirror_hash",
+        "checker_moves",
+        "stale_squares",
+        "evaluator",
+        "accumulator",
+        "_all_legal_moves",
+    )
+
     def __init__(
         self,
         state=None,
@@ -35,8 +73,10 @@ class Position:
         the rest of the data is calculated on the spot. If no data is given, a starting position
         is created.
         """
-        self.state = INITIAL_STATE.copy() if state is None else state
+        self.state = list(INITIAL_STATE) if state is None else state
         self.turn = WHITE if turn is None else turn
+        self.checker_moves = None
+        self.stale_squares = set()
         self.all_legal_moves = (
             self.get_all_legal_moves() if all_legal_moves is None else all_legal_moves
         )
@@ -58,7 +98,27 @@ class Position:
             if not self.checkers_total[BLACK]
             else None
         )
-        self.state_hash = state_hash if state_hash else make_state_hash(self.state)
+        self.state_hash = (
+            state_hash if state_hash else make_state_hash(self.state, self.turn)
+        )
+        self.mirror_hash = make_mirror_hash(self.state, self.turn)
+        self.evaluator = evaluator
+        self.accumulator = evaluator.accumulator(self.state) if evaluator else None
+
+    @property
+    def all_legal_moves(self):
+        """
+        The legal moves of the position (see get_all_legal_moves). Apart from
+        crownings, which are found as soon as they become available, they are
+        only generated the first time they are needed.
+        """
+        if self._all_legal_moves is None:
+            self._all_legal_moves = self.get_other_moves()
+        return self._all_legal_moves
+
+    @all_legal_moves.setter
+    def all_legal_moves(self, all_legal_moves):
+        self._all_legal_moves = all_legal_moves
 
     def count_checkers(self):
         """
@@ -66,67 +126,201 @@ class Position:
         player in the current position.
         """
         white, black = 0, 0
-        for cell in self.state:
-            cell_color, cell_type = self.state[cell]
-            if cell_color == WHITE:
-                white += cell_type
-            else:
-                black += cell_type
+        for piece in self.state:
+            if PIECE_COLOR[piece] == WHITE:
+                white += PIECE_TYPE[piece]
+            elif PIECE_COLOR[piece] == BLACK:
+                black += PIECE_TYPE[piece]
 
         return {WHITE: white, BLACK: black}
 
-    def copy(self):
+    def copy(self, with_legal_moves=True):
+        """
+        Returns a copy of the current position. If with_legal_moves is False, the
+        legal moves are left to be generated when needed.
+        """
+        position = Position.__new__(Position)
+        position.state = self.state.copy()
+        position.turn = self.turn
+        position.checkers_total = self.checkers_total.copy()
+        position.winner = self.winner
+        position.state_hash = self.state_hash
+        position.mirror_hash = self.mirror_hash
+        # The list is replaced rather than changed when updated, so it can be shared
+        position.checker_moves = self.checker_moves
+        position.stale_squares = self.stale_squares.copy()
+        position.evaluator = self.evaluator
+        position.accumulator = (
+            None if self.accumulator is None else self.accumulator.copy()
+        )
+        position._all_legal_moves = (
+            {square: moves.copy() for square, moves in self._all_legal_moves.items()}
+            if with_legal_moves and self._all_legal_moves is not None
+            else None
+        )
+        return position
+
+    # Lines of movement
+
+    def set_piece(self, square, piece):
         """
-        Returns a copy of the current position.
+        Places piece (or EMPTY) at square. The moves of the checker at the square and
+        of the checkers whose movement rays cross the square are marked as stale (see
+        update_checker_moves).
         """
-        state = self.state.copy()
-        checkers_total = self.checkers_total.copy()
-        all_legal_moves = {
-            cell: self.all_legal_moves.copy() for cell in self.all_legal_moves
-        }
-        return Position(
-            state,
-            self.turn,
-            checkers_total,
-            all_legal_moves,
-            self.winner,
-            self.state_hash,
+        state, stale_squares = self.state, self.stale_squares
+        stale_squares.add(square)
+        for behind, pieces in LINES_THROUGH[square]:
+            for other in behind:
+                if other_piece := state[other]:
+                    if other_piece in pieces:
+                        stale_squares.add(other)
+                    break
+        state[square] = piece
+
+    # Compact encoding
+
+    def is_crowning_pending(self):
+        """
+        Returns True if the player to move has to crown one of their checkers.
+        """
+        # Crownings are never left to be generated later
+        if self._all_legal_moves is None:
+            return False
+        return any(
+            tag == "C"
+            for moves in self.all_legal_moves.values()
+            for tag in moves.values()
+        )
+
+    def to_bytes(self):
+        """
+        Returns a canonical encoding of the position in POSITION_BYTES bytes. The
+        encoding can be used as a dictionary key or sent between processes and is
+        decoded by from_bytes.
+        """
+        code = 0
+        for piece in reversed(self.state):
+            code = 5 * code + piece
+        code = 4 * code + 2 * (self.turn == BLACK) + self.is_crowning_pending()
+        return code.to_bytes(POSITION_BYTES, "big")
+
+    @classmethod
+    def from_bytes(cls, data):
+        """
+        Returns the position encoded by to_bytes.
+        """
+        code = int.from_bytes(data, "big")
+        code, phase = divmod(code, 4)
+        turn = BLACK if phase & 2 else WHITE
+        state = [EMPTY] * len(SQUARES)
+        for square in range(len(SQUARES)):
+            code, state[square] = divmod(code, 5)
+        return cls.from_state(state, turn, phase & 1)
+
+    def to_text(self):
+        """
+        Returns a FEN-like text encoding of the position: the rows from top to bottom
+        separated by "/" (with "w", "W", "b", "B" for WHITE and BLACK singles and doubles
+        and digits for runs of empty squares), followed by the player to move ("w" or "b")
+        and "c" if a crowning is pending or "-" otherwise.
+        """
+        rows = []
+        for j in reversed(range(8)):
+            row, empty = "", 0
+            for i in range(j % 2, 8, 2):
+                piece = self.state[SQUARE_INDEX[(i, j)]]
+                if piece == EMPTY:
+                    empty += 1
+                    continue
+                if empty:
+                    row += str(empty)
+                    empty = 0
+                row += PIECE_LETTERS[piece]
+            rows.append(row + (str(empty) if empty else ""))
+        phase = "c" if self.is_crowning_pending() else "-"
+        return f"{'/'.join(rows)} {COLOR_LETTERS[self.turn]} {phase}"
+
+    @classmethod
+    def from_text(cls, text):
+        """
+        Returns the position encoded by to_text. Raises a ValueError if the text is
+        not a valid encoding.
+        """
+        try:
+            board, turn, phase = text.split()
+            pieces = []
+            for row in board.split("/"):
+                for char in row:
+                    if char.isdigit():
+                        pieces.extend([EMPTY] * int(char))
+                    else:
+                        pieces.append(LETTER_PIECES[char])
+            turn = LETTER_COLORS[turn]
+        except (ValueError, KeyError):
+            raise ValueError(f"Invalid position: {text}") from None
+        cells = [(i, j) for j in reversed(range(8)) for i in range(j % 2, 8, 2)]
+        if len(pieces) != len(cells) or phase not in ("c", "-"):
+            raise ValueError(f"Invalid position: {text}")
+        state = [EMPTY] * len(SQUARES)
+        for cell, piece in zip(cells, pieces):
+            state[SQUARE_INDEX[cell]] = piece
+        return cls.from_state(state, turn, phase == "c")
+
+    @classmethod
+    def from_state(cls, state, turn, crowning_pending):
+        """
+        Returns the position with the given state and player to move, in which the
+        legal moves are crownings if crowning_pending is True.
+        """
+        position = cls(state, turn, all_legal_moves={}, winner=())
+        position.all_legal_moves = (
+            position.get_crownings() if crowning_pending else position.get_other_moves()
+        )
+        return position
+
+    def mirrored(self):
+        """
+        Returns the mirrored position (see MIRRORED_SQUARE), whose value is the
+        negation of the value of this position.
+        """
+        state = [EMPTY] * len(SQUARES)
+        for square, piece in enumerate(self.state):
+            state[MIRRORED_SQUARE[square]] = MIRRORED_PIECE[piece]
+        return Position.from_state(
+            state, OPPOSITE_COLOR[self.turn], self.is_crowning_pending()
         )
 
     # Some shortcuts for various checks
 
-    def is_valid(self, cell):
-        return cell in self.state
+    def is_valid(self, square):
+        return 0 <= square < len(SQUARES)
 
-    def is_occupied(self, cell):
-        return cell in self.state and self.state[cell] is not None
+    def is_occupied(self, square):
+        return self.state[square] != EMPTY
 
-    def is_single(self, cell):
-        return self.state[cell][1] == 1
+    def is_single(self, square):
+        return PIECE_TYPE[self.state[square]] == 1
 
-    def is_of_color(self, cell, color):
-        return self.state[cell][0] == color
+    def is_of_color(self, square, color):
+        return PIECE_COLOR[self.state[square]] == color
 
-    def is_occupied_of_color(self, cell, color):
-        return (
-            cell in self.state
-            and self.state[cell] is not None
-            and self.state[cell][0] == color
-        )
+    def is_occupied_of_color(self, square, color):
+        return PIECE_COLOR[self.state[square]] == color
 
-    def is_occupied_single_of_color(self, cell, color):
-        return cell in self.state and self.state[cell] == (color, 1)
+    def is_occupied_single_of_color(self, square, color):
+        return self.state[square] == SINGLE[color]
 
     # Impasse game functions
 
     def get_slides(self, origin):
         """
         Input:
-            - origin (tuple)
+            - origin (int)
 
         Returns:
             - slides (dictionary)
-                Each key in slides is a cell in which origin can move.
+                Each key in slides is a square in which origin can move.
                 The corresponding value is one of:
                     - "S" : indicates a regular slide;
                     - "SB" : indicates a slide which places a crown at its
@@ -134,34 +328,24 @@ class Position:
                     - "SC" : indicates a slide which places a single at its
                         furthest row, thus making crowning possible.
         """
+        state = self.state
         slides = {}
-        for direction in MOVE_DIRECTIONS[self.state[origin]]:
-            for candidate in DIAGONALS[(origin, direction)]:
-                if self.is_occupied(candidate):
+        for ray in SLIDES[state[origin]][origin]:
+            for target, tag in ray:
+                if state[target]:
                     break
-                else:
-                    # Slide leading to bear off
-                    if candidate in HOME_ROW[self.turn]:
-                        slides[candidate] = "SB"
-                    # Slide leading to available crowning
-                    elif candidate in HOME_ROW[
-                        OPPOSITE_COLOR[self.turn]
-                    ] and self.is_single(origin):
-                        slides[candidate] = "SC"
-                    # Regular slide
-                    else:
-                        slides[candidate] = "S"
+                slides[target] = tag
 
         return slides
 
     def get_transposes(self, origin):
         """
         Input:
-            - origin (tuple)
+            - origin (int)
 
         Returns:
             - transposes (dictionary):
-                Each key in transposes is a cell in which origin can transpose.
+                Each key in transposes is a square in which origin can transpose.
                 The corresponding value is one of:
                     - "T" : indicates a regular transpose;
                     - "TB" : indicates a transpose which places a crown
@@ -170,49 +354,56 @@ class Position:
                         at its furthest row, thus making crowning possible.
 
         """
-        transposes = {}
-        for direction in MOVE_DIRECTIONS[self.state[origin]]:
-            candidate = (origin[0] + direction[0], origin[1] + direction[1])
-            if self.is_occupied_single_of_color(candidate, self.turn):
-                # Transpose leading to bear off
-                if candidate in HOME_ROW[self.turn]:
-                    transposes[candidate] = "TB"
-                # Transpose leading to available crowning
-                elif origin in HOME_ROW[OPPOSITE_COLOR[self.turn]]:
-                    transposes[candidate] = "TC"
-                # Regular transpose
-                else:
-                    transposes[candidate] = "T"
+        single = SINGLE[PIECE_COLOR[self.state[origin]]]
+        return {
+            target: tag
+            for target, tag in TRANSPOSES[self.state[origin]][origin]
+            if self.state[target] == single
+        }
 
-        return transposes
+    def get_moves(self, origin):
+        """
+        Returns the slides and transposes of the checker at origin, in the same
+        form as get_slides and get_transposes, whichever player is to move.
+        """
+        if PIECE_TYPE[self.state[origin]] == 1:
+            # Get slides for singles
+            return self.get_slides(origin)
+        # Get transposes and slides for crowns
+        return self.get_transposes(origin) | self.get_slides(origin)
 
     def get_singles_except(self, target):
         """
         Input:
-            - target (tuple)
+            - target (int)
 
         Returns:
-            - a list of all cells other than target containing a single friendly checker.
+            - a list of all squares other than target containing a single friendly
+                checker.
         """
+        single = SINGLE[self.turn]
         return [
-            cell
-            for cell in self.state
-            if cell != target and self.is_occupied_single_of_color(cell, self.turn)
+            square
+            for square, piece in enumerate(self.state)
+            if piece == single and square != target
         ]
 
     def get_crownings(self):
         """
         Returns all available crownings in a dictionary with entries of the form
         'origin: crownings', in which 'crownings' is a dictionary with entries of the
-        form 'target: "C"', where 'target' is a cell with a checker that needs to be
-        crowned and "C" denotes that the move is a crowning, while 'origin' is a cell
+        form 'target: "C"', where 'target' is a square with a checker that needs to be
+        crowned and "C" denotes that the move is a crowning, while 'origin' is a square
         containing a single checker that can be used for the crowning of 'target'.
         """
         crownings = {}
         for target in HOME_ROW[OPPOSITE_COLOR[self.turn]]:
-            if self.is_occupied(target) and self.state[target] == (self.turn, 1):
+            if self.state[target] == SINGLE[self.turn]:
                 crownings.update(
-                    {cell: {target: "C"} for cell in self.get_singles_except(target)}
+                    {
+                        square: {target: "C"}
+                        for square in self.get_singles_except(target)
+                    }
                 )
 
         return crownings
@@ -221,30 +412,50 @@ class Position:
         """
         Gets all available moves other than crownings. Returns a dictionary with
         entries of the form 'origin: moves', where 'moves' is a dictionary with
-        entries of the form 'target: tag', where 'target' is a cell at which
+        entries of the form 'target: tag', where 'target' is a square at which
         'origin' can move ('target' is None for bear offs) and 'tag' is the
         corresponding move tag (one of "S", "SB", "SC", "T" "TB", "TC", "B").
         """
-        other_moves = {}
-        for cell in self.state:
-            if self.is_occupied_of_color(cell, self.turn):
-                if self.state[cell][1] == 1:
-                    # Get slides for singles
-                    moves = self.get_slides(cell)
-                else:
-                    # Get transposes and slides for crowns
-                    moves = self.get_transposes(cell) | self.get_slides(cell)
-                if moves:
-                    other_moves[cell] = moves
+        single, double = SINGLE[self.turn], DOUBLE[self.turn]
+        checker_moves = self.update_checker_moves()
+        other_moves = {
+            square: checker_moves[square]
+            for square, piece in enumerate(self.state)
+            if (piece == single or piece == double) and checker_moves[square]
+        }
         # Impasse
         if not other_moves:
             return {
-                cell: {None: "B"}
-                for cell in self.state
-                if self.is_occupied_of_color(cell, self.turn)
+                square: {None: "B"}
+                for square, piece in enumerate(self.state)
+                if piece in (single, double)
             }
         return other_moves
 
+    def update_checker_moves(self):
+        """
+        Returns checker_moves, the list of the moves (as given by get_moves) of the
+        checker on each square, or None for empty squares. Instead of generating all
+        the moves of each position, the list is inherited from the position a move
+        was made in, and only the moves of the checkers on the squares changed by
+        the move and of the checkers whose rays cross them (the stale squares) are
+        generated again.
+        """
+        if self.checker_moves is None:
+            self.checker_moves = [
+                self.get_moves(square) if piece else None
+                for square, piece in enumerate(self.state)
+            ]
+        elif self.stale_squares:
+            checker_moves = self.checker_moves.copy()
+            for square in self.stale_squares:
+                checker_moves[square] = (
+                    self.get_moves(square) if self.state[square] else None
+                )
+            self.checker_moves = checker_moves
+        self.stale_squares.clear()
+        return self.checker_moves
+
     def get_all_legal_moves(self):
         """
         Returns all legal moves in the position. If there are available crownings then
@@ -254,11 +465,23 @@ class Position:
             return crownings
         return self.get_other_moves()
 
+    def is_legal_move(self, origin, target, tag):
+        """
+        Returns True if (origin, target, tag) is a legal move in the position,
+        without generating all legal moves if they have not been generated yet.
+        """
+        if self._all_legal_moves is not None or tag == "B":
+            return self.all_legal_moves.get(origin, {}).get(target) == tag
+        return (
+            PIECE_COLOR[self.state[origin]] == self.turn
+            and self.get_moves(origin).get(target) == tag
+        )
+
     def apply_move(self, origin, target, tag):
         """
         Input:
-            - origin (tuple)
-            - target (tuple)
+            - origin (int)
+            - target (int)
             - tag (string)
 
         Returns:
@@ -266,37 +489,40 @@ class Position:
                 The part of the state dictionary that needs to be changed if a move
                 described by origin, target and tag is applied on the current state.
         """
-        origin_type = self.state[origin][1]
+        origin_piece = self.state[origin]
+        single, double = SINGLE[self.turn], DOUBLE[self.turn]
         # Slide
         if tag in ("S", "SC"):
-            state_update = {origin: None, target: (self.turn, origin_type)}
+            state_update = {origin: EMPTY, target: origin_piece}
         # Slide + Bear off
         elif tag == "SB":
-            state_update = {origin: None, target: (self.turn, 1)}
+            state_update = {origin: EMPTY, target: single}
         # Transpose
         elif tag in ("T", "TC"):
-            state_update = {origin: (self.turn, 1), target: (self.turn, 2)}
+            state_update = {origin: single, target: double}
         # Transpose + Bear off
         elif tag == "TB":
-            state_update = {origin: (self.turn, 1), target: (self.turn, 1)}
+            state_update = {origin: single, target: single}
         # Crowning
         elif tag == "C":
-            state_update = {origin: None, target: (self.turn, 2)}
+            state_update = {origin: EMPTY, target: double}
         # Bear off
         elif tag == "B":
-            if origin_type == 1:
-                state_update = {origin: None}
+            if origin_piece == single:
+                state_update = {origin: EMPTY}
             else:
-                state_update = {origin: (self.turn, 1)}
+                state_update = {origin: single}
 
         return state_update
 
     def change_turn(self):
         """
-        Change turn and find the new legal moves.
+        Change turn. The new legal moves are generated when first needed.
         """
         self.turn = OPPOSITE_COLOR[self.turn]
-        self.all_legal_moves = self.get_other_moves()
+        self.state_hash ^= black_to_move_id
+        self.mirror_hash ^= black_to_move_id
+        self.all_legal_moves = None
 
     def check_for_crownings_and_change_turn(self):
         """
@@ -313,10 +539,15 @@ class Position:
         Updates the position data according to the state_update
         and the tag of the move that led to it.
         """
-        old_state = {cell: self.state[cell] for cell in state_update}
-        self.state_hash ^= make_state_hash(old_state)
-        self.state_hash ^= make_state_hash(state_update)
-        self.state.update(state_update)
+        for square, piece in state_update.items():
+            old_piece = self.state[square]
+            self.state_hash ^= rand_ids[square][old_piece] ^ rand_ids[square][piece]
+            self.mirror_hash ^= (
+                mirror_ids[square][old_piece] ^ mirror_ids[square][piece]
+            )
+            if self.accumulator is not None:
+                self.evaluator.update(self.accumulator, square, old_piece, piece)
+            self.set_piece(square, piece)
         # Bear off
         if tag == "B":
             self.checkers_total[self.turn] -= 1
@@ -348,7 +579,7 @@ class Position:
         Returns a new Position object derived from applying a move
         on the current state.
         """
-        new_position = self.copy()
+        new_position = self.copy(with_legal_moves=False)
         state_update = new_position.apply_move(origin, target, tag)
         new_position.update(state_update, tag)
         return new_position
@@ -357,7 +588,7 @@ class Position:
         self,
         color,
         start,
-        anchor_cell,
+        anchor,
         i,
         doubles_with_paths,
         steps,
@@ -365,12 +596,12 @@ class Position:
         changed_dir,
     ):
         """
-        A recursive function that finds the shortest path from start (a cell
+        A recursive function that finds the shortest path from start (a square
         containing a double checker) to bear off, if such a path exists.
         """
-        d = MOVE_DIRECTIONS[(color, 2)][i]
-        for cell in DIAGONALS[(anchor_cell, d)]:
-            if not self.is_occupied(cell):
+        single = SINGLE[color]
+        for square in RAYS[DOUBLE[color]][anchor][i]:
+            if not self.state[square]:
                 # A step is added if we move from a single
                 # to an empty cell
                 if not prev_empty:
@@ -379,7 +610,7 @@ class Position:
                 changed_dir = False
                 # Add one step before changing direction
                 new_steps = steps + 1
-            elif self.is_occupied_single_of_color(cell, color):
+            elif self.state[square] == single:
                 # A step is added if we encounter a single cell
                 # unless it is after changing direction at an empty
                 # cell (since then we have already added a step)
@@ -392,23 +623,19 @@ class Position:
             else:
                 break
 
-            # Add the shortest path to bear off found so far for
-            # each double (converted into a score out of 10)
-            if cell in HOME_ROW[color] and (
-                start not in doubles_with_paths
-                or (
-                    start in doubles_with_paths
-                    and DOUBLES_PATHS_MAX - steps > doubles_with_paths[start]
-                )
+            # Keep the shortest path to bear off found so far for
+            # each double (in number of steps)
+            if IS_HOME_ROW[color][square] and (
+                start not in doubles_with_paths or steps < doubles_with_paths[start]
             ):
-                doubles_with_paths[start] = DOUBLES_PATHS_MAX - steps
+                doubles_with_paths[start] = steps
                 break
 
             # Change direction
             doubles_with_paths = self.path_to_bear_off(
                 color,
                 start,
-                cell,
+                square,
                 1 - i,
                 doubles_with_paths,
                 new_steps,
@@ -418,33 +645,28 @@ class Position:
 
         return doubles_with_paths
 
-    def path_to_crown(self, color, start, anchor_cell, i, singles_with_paths, steps):
+    def path_to_crown(self, color, start, anchor, i, singles_with_paths, steps):
         """
-        A recursive function that finds the shortest path from start (a cell
+        A recursive function that finds the shortest path from start (a square
         containing a single checker) to a crowning square, if such a path
         exists.
         """
-        d = MOVE_DIRECTIONS[(color, 1)][i]
-        for cell in DIAGONALS[(anchor_cell, d)]:
-            if self.is_occupied(cell):
+        for square in RAYS[SINGLE[color]][anchor][i]:
+            if self.state[square]:
                 break
 
-            # Add the shortest path to bear off found so far for
-            # each double (converted into a score out of 10)
-            if cell in HOME_ROW[OPPOSITE_COLOR[color]] and (
-                start not in singles_with_paths
-                or (
-                    start in singles_with_paths
-                    and SINGLES_PATHS_MAX - steps > singles_with_paths[start]
-                )
+            # Keep the shortest path to crowning found so far for
+            # each single (in number of steps)
+            if IS_HOME_ROW[OPPOSITE_COLOR[color]][square] and (
+                start not in singles_with_paths or steps < singles_with_paths[start]
             ):
-                singles_with_paths[start] = SINGLES_PATHS_MAX - steps
+                singles_with_paths[start] = steps
 
             # Change direction (add 1 to steps)
             singles_with_paths = self.path_to_crown(
                 color,
                 start,
-                cell,
+                square,
                 1 - i,
                 singles_with_paths,
                 steps + 1,
@@ -454,34 +676,60 @@ class Position:
 
     def future_bear_offs_and_doubles(self, color):
         """
-        Returns the score associated to all the possible future bear offs of a player,
-        as well as the number of double checkers they have.
+        Returns the number of double checkers of a player that have a path to bear off
+        and the total length of those paths, as well as the number of double checkers
+        they have.
         """
         doubles = 0
         doubles_with_paths = {}
-        for start in self.state:
-            if self.is_occupied_of_color(start, color) and not self.is_single(start):
+        for start, piece in enumerate(self.state):
+            if piece == DOUBLE[color]:
                 doubles += 1
                 for i in (0, 1):
                     doubles_with_paths = self.path_to_bear_off(
                         color, start, start, i, doubles_with_paths, 0, False, False
                     )
 
-        return sum(doubles_with_paths.values()), doubles
+        return len(doubles_with_paths), sum(doubles_with_paths.values()), doubles
 
     def future_crowns(self, color):
         """
-        Returns the score associated to all the possible future crownings of a player.
+        Returns the number of single checkers of a player that have a path to
+        crowning and the total length of those paths.
         """
         singles_with_paths = {}
-        for start in self.state:
-            if self.is_occupied_single_of_color(start, color):
+        for start, piece in enumerate(self.state):
+            if piece == SINGLE[color]:
                 for i in (0, 1):
                     singles_with_paths = self.path_to_crown(
                         color, start, start, i, singles_with_paths, 1
                     )
 
-        return sum(singles_with_paths.values())
+        return len(singles_with_paths), sum(singles_with_paths.values())
+
+    def evaluation_features(self):
+        """
+        Returns the features combined by evaluate, each of them taken as a difference
+        between the two players:
+        - number of checkers (BLACK - WHITE);
+        - number of double checkers (WHITE - BLACK), only counted when both players
+            have the same number of checkers;
+        - number of doubles with a path to bear off and total length of those paths;
+        - number of singles with a path to crowning and total length of those paths.
+        """
+        dpw, dsw, dw = self.future_bear_offs_and_doubles(WHITE)
+        dpb, dsb, db = self.future_bear_offs_and_doubles(BLACK)
+        spw, ssw = self.future_crowns(WHITE)
+        spb, ssb = self.future_crowns(BLACK)
+        checkers_count = self.checkers_total[BLACK] - self.checkers_total[WHITE]
+        return (
+            checkers_count,
+            0 if checkers_count else dw - db,
+            dpw - dpb,
+            dsw - dsb,
+            spw - spb,
+            ssw - ssb,
+        )
 
     def evaluate(self):
         """
@@ -492,21 +740,27 @@ class Position:
             considered instead);
         - number and length of paths each player has towards bear-off;
         - number and length of paths each player has towards crowning.
+        Each path scores its maximum (DOUBLES_PATHS_MAX or SINGLES_PATHS_MAX)
+        minus its length.
+        If the position has a network evaluator (see set_evaluator), it replaces
+        this formula while the game is not over.
         """
         if self.winner is not None:
             win_eval = 1000
             return win_eval if self.winner == WHITE else -win_eval
-        dwpw, dw = self.future_bear_offs_and_doubles(WHITE)
-        dwpb, db = self.future_bear_offs_and_doubles(BLACK)
-        checkers_count = self.checkers_total[BLACK] - self.checkers_total[WHITE]
-        if checkers_count:
-            value = CHECKERS_COUNT_WEIGHT * checkers_count
-        else:
-            value = DOUBLES_WEIGHT * (dw - db)
-        doubles_path_score = dwpw - dwpb
-        singles_path_score = self.future_crowns(WHITE) - self.future_crowns(BLACK)
-        value += (
-            DOUBLES_PATHS_WEIGHT * doubles_path_score
-            + SINGLES_PATHS_WEIGHT * singles_path_score
+        if self.accumulator is not None:
+            return self.evaluator.evaluate(self.accumulator)
+        (
+            checkers_count,
+            doubles,
+            doubles_paths,
+            doubles_steps,
+            singles_paths,
+            singles_steps,
+        ) = self.evaluation_features()
+        return (
+            CHECKERS_COUNT_WEIGHT * checkers_count
+            + DOUBLES_WEIGHT * doubles
+            + DOUBLES_PATHS_WEIGHT * (DOUBLES_PATHS_MAX * doubles_paths - doubles_steps)
+            + SINGLES_PATHS_WEIGHT * (SINGLES_PATHS_MAX * singles_paths - singles_steps)
         )
-        return value
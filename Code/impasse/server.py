@@ -0,0 +1,377 @@
+"""
+A game server hosting many concurrent games against the AI.
+
+Clients connect over TCP (on localhost by default) and exchange JSON objects, one
+per line. Each request gets one reply (with "error" set if it failed), and the
+moves of the AI are pushed to the client owning the game as they are found:
+- {"command": "new", "ai": "white" | "black" | null, "time": MS, "increment": MS,
+  "fen": TEXT (optional)}: starts a game (with the given clock for each player,
+  and from the position given in text form, see Position.to_text). Replies with
+  the state of the game, which includes its ID.
+- {"command": "move", "game": ID, "move": "G7F6"}: plays a move (in compact
+  notation) and replies with the state of the game.
+- {"command": "state", "game": ID}
+- {"command": "resign", "game": ID}: resigns for the player to move.
+- {"command": "metrics"}: the numbers of games, of queued and running searches, and
+  statistics of the searches.
+The games of a client end when it disconnects.
+The state of a game is {"game": ID, "position": TEXT, "turn": "w" | "b", "moves":
+[...], "clocks": {"w": MS, "b": MS}, "winner": "w" | "b" | null, "result": ...}, and
+each move of the AI is pushed as {"event": "move", "move": M} followed by the
+state of the game. If a search fails (e.g. because its worker process died), the
+game ends as a loss for the AI and {"event": "error", "error": ...} is pushed
+instead of the move.
+
+The searches of the AI run in a pool of worker processes, so that the event loop
+never waits for them. They are queued in a bounded queue: when it is full, the
+server stops reading the requests of a client until a search can be queued, so a
+busy server slows its clients down instead of piling up work. The clock of the AI
+runs while its search runs, but not while it waits in the queue.
+
+Usage:
+    python server.py [--host HOST] [--port PORT] [--workers N] [--queue Q]
+"""
+
+import argparse
+import asyncio
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+import itertools
+import json
+import os
+import time
+
+from impasse.ai import *
+from impasse.constants import *
+from impasse.engine import MOVES_TO_GO
+from impasse.game_records import *
+from impasse.position import *
+
+SERVER_PORT = 8765
+# Default clock of each player (with no increment)
+GAME_MILLISECONDS = 5 * 60 * 1000
+# Maximum number of searches waiting for a worker
+SEARCH_QUEUE_SIZE = 256
+
+
+# Worker processes
+
+
+worker_ai = None
+
+
+def search_move(position_bytes, milliseconds_per_move, max_milliseconds_per_move):
+    """
+    Searches a position (given by its bytes encoding) in a worker process. Returns
+    the best move found in compact notation. Each worker keeps its AI, and so its
+    transposition table, for all the games it searches.
+    """
+    global worker_ai
+    position = Position.from_bytes(position_bytes)
+    if worker_ai is None:
+        worker_ai = AI(position.turn)
+    _, _, (origin, target, _) = worker_ai.iterative_deepening(
+        position,
+        milliseconds_per_move=milliseconds_per_move,
+        max_milliseconds_per_move=max_milliseconds_per_move,
+        min_search_depth=0,
+    )
+    return move_to_string(origin, target)
+
+
+# Games
+
+
+class Game:
+    """
+    A game between a client and the AI (or between two clients sharing a game).
+    """
+
+    def __init__(self, game_id, position: Position, ai_color, milliseconds, increment):
+        self.id = game_id
+        self.position = position
+        self.ai_color = ai_color
+        self.clocks = {WHITE: milliseconds, BLACK: milliseconds}
+        self.increment = increment
+        self.move_strings = []
+        self.winner = None
+        self.result = None
+        # Time (in milliseconds since the epoch) at which the clock of the player to
+        # move was started (None while the AI waits for a worker)
+        self.turn_start = milliseconds_now()
+        self.writer = None
+
+    def time_left(self):
+        """
+        Returns the time left on the clock of the player to move.
+        """
+        if self.turn_start is None:
+            return self.clocks[self.position.turn]
+        return self.clocks[self.position.turn] - (milliseconds_now() - self.turn_start)
+
+    def check_clock(self):
+        """
+        Ends the game if the player to move has run out of time.
+        """
+        if self.winner is None and self.time_left() <= 0:
+            self.clocks[self.position.turn] = 0
+            self.winner = OPPOSITE_COLOR[self.position.turn]
+            self.result = "time"
+
+    def play(self, move_string):
+        """
+        Plays a move of the player to move. Raises a ValueError if the move is illegal.
+        """
+        move = string_to_move(self.position, move_string)
+        color = self.position.turn
+        self.clocks[color] = self.time_left()
+        self.position = self.position.new_position_after_move(*move)
+        self.move_strings.append(move_string)
+        if self.position.winner is not None:
+            self.winner = self.position.winner
+            self.result = "bear off"
+        elif self.position.turn != color:
+            # The turn ends (a player keeps moving to crown a checker)
+            self.clocks[color] += self.increment
+        self.turn_start = milliseconds_now()
+
+    def state(self):
+        return {
+            "game": self.id,
+            "position": self.position.to_text(),
+            "turn": COLOR_LETTERS[self.position.turn],
+            "moves": self.move_strings,
+            "clocks": {
+                COLOR_LETTERS[color]: max(
+                    self.time_left() if color == self.position.turn else clock, 0
+                )
+                for color, clock in self.clocks.items()
+            },
+            "winner": COLOR_LETTERS.get(self.winner),
+            "result": self.result,
+        }
+
+
+def milliseconds_now():
+    return milliseconds(time.time())
+
+
+class Server:
+    """
+    Hosts the games and dispatches the searches of the AI to the worker processes.
+    """
+
+    def __init__(self, workers=None, queue_size=SEARCH_QUEUE_SIZE):
+        self.workers = workers or os.cpu_count()
+        self.executor = ProcessPoolExecutor(self.workers)
+        self.queue = asyncio.Queue(queue_size)
+        self.games = {}
+        self.game_ids = itertools.count(1)
+        # Metrics
+        self.running = 0
+        self.max_queued = 0
+        self.searches = 0
+        self.total_wait = 0
+        self.total_search = 0
+
+    # Searches
+
+    async def request_search(self, game: Game):
+        """
+        Queues a search for the AI's move in a game (waiting while the queue is full).
+        """
+        game.turn_start = None
+        await self.queue.put((game, milliseconds_now()))
+        self.max_queued = max(self.max_queued, self.queue.qsize())
+
+    async def dispatch_searches(self):
+        """
+        Runs queued searches in the worker processes, as many at a time as there are
+        workers.
+        """
+        loop = asyncio.get_running_loop()
+        while True:
+            game, queued_time = await self.queue.get()
+            if game.result is not None:
+                continue
+            game.turn_start = start = milliseconds_now()
+            self.total_wait += start - queued_time
+            time_left = game.clocks[game.position.turn]
+            move_time = time_left // MOVES_TO_GO + game.increment
+            self.running += 1
+            executor = self.executor
+            try:
+                move_string = await loop.run_in_executor(
+                    executor,
+                    search_move,
+                    game.position.to_bytes(),
+                    move_time,
+                    min(3 * move_time, time_left // 2),
+                )
+            except Exception as error:
+                # A pool whose worker process died cannot run any more searches, so
+                # it is replaced (once, by the first dispatcher to notice)
+                if isinstance(error, BrokenProcessPool) and self.executor is executor:
+                    self.executor = ProcessPoolExecutor(self.workers)
+                await self.abort_search(game, error)
+                continue
+            finally:
+                self.running -= 1
+            self.searches += 1
+            self.total_search += milliseconds_now() - start
+            # The game may have ended (e.g. by resignation) during the search
+            if game.result is None:
+                game.check_clock()
+            if game.result is None:
+                game.play(move_string)
+                await self.send(game.writer, {"event": "move", "move": move_string})
+            await self.send(game.writer, game.state())
+            if game.winner is None and game.position.turn == game.ai_color:
+                asyncio.create_task(self.request_search(game))
+
+    async def abort_search(self, game: Game, error):
+        """
+        Ends a game whose search failed as a loss for the AI, and reports the error
+        to its client.
+        """
+        if game.result is None:
+            game.winner = OPPOSITE_COLOR[game.ai_color]
+            game.result = "engine error"
+        await self.send(game.writer, {"event": "error", "error": repr(error)})
+        await self.send(game.writer, game.state())
+
+    def metrics(self):
+        return {
+            "games": len(self.games),
+            "active_games": sum(game.result is None for game in self.games.values()),
+            "workers": self.workers,
+            "queued": self.queue.qsize(),
+            "max_queued": self.max_queued,
+            "running": self.running,
+            "searches": self.searches,
+            "average_wait": self.total_wait / self.searches if self.searches else 0,
+            "average_search": (
+                self.total_search / self.searches if self.searches else 0
+            ),
+        }
+
+    # Clients
+
+    async def send(self, writer, message):
+        """
+        Sends a message to a client. Messages to clients which have disconnected are
+        dropped (their games end when handle_client sees the connection closed).
+        """
+        if writer is None or writer.is_closing():
+            return
+        try:
+            writer.write((json.dumps(message) + "\n").encode())
+            await writer.drain()
+        except ConnectionError:
+            pass
+
+    async def handle_client(self, reader, writer):
+        try:
+            while line := await reader.readline():
+                try:
+                    request = json.loads(line)
+                    if not isinstance(request, dict):
+                        raise ValueError("Requests must be JSON objects")
+                    reply = await self.execute(request, writer)
+                except (ValueError, KeyError, TypeError) as error:
+                    reply = {"error": str(error)}
+                await self.send(writer, reply)
+        except ConnectionError:
+            pass
+        finally:
+            # The games of a client end when it disconnects
+            for game_id, game in list(self.games.items()):
+                if game.writer is writer:
+                    game.writer = None
+                    if game.result is None:
+                        game.result = "abandoned"
+                    del self.games[game_id]
+            writer.close()
+
+    async def execute(self, request, writer):
+        """
+        Executes a request of a client. Returns the reply.
+        """
+        command = request.get("command")
+        if command not in ("new", "move", "state", "resign", "metrics"):
+            raise ValueError(f"Unknown command: {command}")
+        if command == "metrics":
+            return self.metrics()
+        if command == "new":
+            game = self.new_game(request)
+            game.writer = writer
+            if game.position.turn == game.ai_color:
+                await self.request_search(game)
+            return game.state()
+        if (game := self.games.get(request.get("game"))) is None:
+            raise ValueError(f"Unknown game: {request.get('game')}")
+        if command == "state":
+            game.check_clock()
+            return game.state()
+        if game.result is not None:
+            raise ValueError("The game is over")
+        if command == "resign":
+            game.winner = OPPOSITE_COLOR[game.position.turn]
+            game.result = "resignation"
+            return game.state()
+        if command == "move":
+            if game.position.turn == game.ai_color:
+                raise ValueError("Not your turn")
+            game.check_clock()
+            if game.winner is None:
+                game.play(request["move"])
+                if game.winner is None and game.position.turn == game.ai_color:
+                    await self.request_search(game)
+        return game.state()
+
+    def new_game(self, request):
+        ai = request.get("ai", "black")
+        ai_color = None if ai is None else {"white": WHITE, "black": BLACK}[ai]
+        position = (
+            Position.from_text(request["fen"]) if "fen" in request else Position()
+        )
+        game = Game(
+            next(self.game_ids),
+            position,
+            ai_color,
+            int(request.get("time", GAME_MILLISECONDS)),
+            int(request.get("increment", 0)),
+        )
+        self.games[game.id] = game
+        return game
+
+    async def serve(self, host="127.0.0.1", port=SERVER_PORT):
+        dispatchers = [
+            asyncio.create_task(self.dispatch_searches()) for _ in range(self.workers)
+        ]
+        server = await asyncio.start_server(self.handle_client, host, port)
+        print(f"Serving on {host}:{port} with {self.workers} workers", flush=True)
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            for dispatcher in dispatchers:
+                dispatcher.cancel()
+            self.executor.shutdown(cancel_futures=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Host games against the AI.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=SERVER_PORT)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--queue", type=int, default=SEARCH_QUEUE_SIZE)
+    args = parser.parse_args()
+    try:
+        asyncio.run(Server(args.workers, args.queue).serve(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,143 @@
+from math import inf
+import time
+
+from impasse.constants import *
+from impasse.position import *
+
+
+class ProofNumberSolver:
+    """
+    An endgame solver using depth-first proof-number search (df-pn), which proves
+    whether the player to move wins or loses a position, as opposed to the heuristic
+    values of the alpha-beta search. Proof and disproof numbers are given from the
+    point of view of the player to move in each position: a position is proven when
+    its proof number is 0 (the player to move wins) and disproven when its disproof
+    number is 0 (the player to move loses). Since a player moves again after a move
+    which allows a crowning, the numbers of a child position are swapped only if the
+    turn changes. Positions can never repeat (see AI.alpha_beta), so the search is
+    free of the problems of cycles.
+    The numbers are kept in a table of SOLVER_TABLE_SIZE entries indexed by the hash
+    of each position (kept between searches, as proofs stay valid), and each search
+    is limited by a number of nodes and a time limit.
+    """
+
+    def __init__(self):
+        self.table = [None] * SOLVER_TABLE_SIZE
+        self.nodes = 0
+        self.max_nodes = SOLVER_NODES
+        self.deadline = None
+
+    def retrieve(self, position: Position):
+        """
+        Returns the proof and disproof numbers of a position (1 and 1 if unknown).
+        """
+        entry = self.table[position.state_hash & (SOLVER_TABLE_SIZE - 1)]
+        if entry and entry[0] == position.state_hash:
+            return entry[1], entry[2]
+        return 1, 1
+
+    def store(self, position: Position, proof, disproof):
+        """
+        Stores the proof and disproof numbers of a position, replacing those of any
+        other position in its slot. (Keeping solved positions instead would leave the
+        parent of this position waiting for numbers which are never stored, searching
+        it again and again.)
+        """
+        self.table[position.state_hash & (SOLVER_TABLE_SIZE - 1)] = (
+            position.state_hash,
+            proof,
+            disproof,
+        )
+
+    def children(self, position: Position):
+        """
+        Returns the moves of a position along with the positions they lead to.
+        """
+        return [
+            (
+                (origin, target, tag),
+                position.new_position_after_move(origin, target, tag),
+            )
+            for origin, targets in position.all_legal_moves.items()
+            for target, tag in targets.items()
+        ]
+
+    def child_numbers(self, position: Position, child: Position):
+        """
+        Returns the proof and disproof numbers of a child position from the point of
+        view of the player to move in the parent position.
+        """
+        if child.winner is not None:
+            return (0, inf) if child.winner == position.turn else (inf, 0)
+        proof, disproof = self.retrieve(child)
+        return (proof, disproof) if child.turn == position.turn else (disproof, proof)
+
+    def numbers(self, position: Position, children):
+        """
+        Returns the proof and disproof numbers of a position given its children,
+        along with the index of the child with the smallest proof number and the
+        second smallest proof number.
+        """
+        proof, second_proof, disproof, best = inf, inf, 0, 0
+        for i, (_, child) in enumerate(children):
+            child_proof, child_disproof = self.child_numbers(position, child)
+            disproof += child_disproof
+            if child_proof < proof:
+                proof, second_proof, best = child_proof, proof, i
+            elif child_proof < second_proof:
+                second_proof = child_proof
+        return proof, disproof, best, second_proof
+
+    def mid(self, position: Position, proof_threshold, disproof_threshold):
+        """
+        Searches a position until its proof number reaches proof_threshold or its
+        disproof number reaches disproof_threshold.
+        """
+        self.nodes += 1
+        if self.nodes >= self.max_nodes or time.time() > self.deadline:
+            raise SolverLimitReached
+        children = self.children(position)
+        while True:
+            proof, disproof, best, second_proof = self.numbers(position, children)
+            self.store(position, proof, disproof)
+            if proof >= proof_threshold or disproof >= disproof_threshold:
+                return
+            _, child = children[best]
+            child_proof, child_disproof = self.child_numbers(position, child)
+            # Thresholds from the point of view of the player to move in the child
+            proof_threshold_child = min(
+                proof_threshold, second_proof * (1 + SOLVER_EPSILON) + 1
+            )
+            disproof_threshold_child = disproof_threshold - disproof + child_disproof
+            if child.turn == position.turn:
+                self.mid(child, proof_threshold_child, disproof_threshold_child)
+            else:
+                self.mid(child, disproof_threshold_child, proof_threshold_child)
+
+    def solve(
+        self,
+        position: Position,
+        max_nodes=SOLVER_NODES,
+        milliseconds=SOLVER_MILLISECONDS,
+    ):
+        """
+        Tries to solve a position within the given limits. Returns the winner with best
+        play (or None if the position was not solved in time), along with a winning
+        move if the player to move wins.
+        """
+        self.nodes = 0
+        self.max_nodes = max_nodes
+        self.deadline = time.time() + milliseconds / 1000
+        if position.winner is not None:
+            return position.winner, None
+        try:
+            self.mid(position, inf, inf)
+        except SolverLimitReached:
+            pass
+        children = self.children(position)
+        proof, disproof, best, _ = self.numbers(position, children)
+        if proof == 0:
+            return position.turn, children[best][0]
+        if disproof == 0:
+            return OPPOSITE_COLOR[position.turn], None
+        return None, None
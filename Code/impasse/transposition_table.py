@@ -0,0 +1,153 @@
+import mmap
+import os
+import struct
+
+from impasse.constants import *
+from impasse.position import *
+
+# Each entry holds the full key, the value, the best move (packed by encode_move),
+# the flag, the depth and the generation of the search that stored it
+ENTRY = struct.Struct("<QdHBBB3x")
+HEADER = struct.Struct("<8sQB7x")
+MAGIC = b"IMPTT002"
+# Flags of the stored values (0 marks an empty slot)
+EXACT = 1
+LOWER_BOUND = 2
+UPPER_BOUND = 3
+# The flags of an entry seen from the mirrored position, whose value is negated
+MIRRORED_TT_FLAGS = (0, EXACT, UPPER_BOUND, LOWER_BOUND)
+
+
+class TranspositionTable:
+    """
+    A fixed size transposition table stored in a memory map, so that it can be
+    saved to and loaded from a file without any conversion. Each position is
+    stored in the slot given by the lowest bits of its hash. Entries are replaced
+    by deeper searches, and entries from older searches (generations) are always
+    replaced first.
+    """
+
+    def __init__(self, size=TT_SIZE, path=None):
+        """
+        Creates an empty table with size slots (a power of 2) or, if path is given,
+        maps the table saved in that file. Changes to a mapped table are not written
+        back to its file unless it is saved.
+        """
+        if path is None:
+            self.size = size
+            self.memory = mmap.mmap(-1, HEADER.size + size * ENTRY.size)
+            self.generation = 1
+        else:
+            with open(path, "rb") as file:
+                self.memory = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_COPY)
+            magic, self.size, generation = HEADER.unpack_from(self.memory)
+            expected_length = HEADER.size + self.size * ENTRY.size
+            if magic != MAGIC or len(self.memory) != expected_length:
+                raise ValueError(f"Not a transposition table file: {path}")
+            # Entries of the saved searches are the first to be replaced
+            self.generation = generation % 255 + 1
+        self.mask = self.size - 1
+
+    def new_generation(self):
+        """
+        Marks the start of a new search, making all stored entries stale.
+        """
+        self.generation = self.generation % 255 + 1
+
+    def offset(self, key):
+        return HEADER.size + (key & self.mask) * ENTRY.size
+
+    def retrieve(self, key):
+        """
+        Returns the value, move, flag and depth stored for key (all None if
+        there is no such entry).
+        """
+        stored_key, value, move, flag, depth, _ = ENTRY.unpack_from(
+            self.memory, self.offset(key)
+        )
+        if stored_key != key or not flag:
+            return None, None, None, None
+        if value.is_integer():
+            value = int(value)
+        return value, DECODED_MOVES[move], flag, depth
+
+    def store(self, key, value, move, flag, depth):
+        """
+        Stores an entry for key, unless its slot holds a deeper entry of
+        another position from the current search.
+        """
+        offset = self.offset(key)
+        stored_key, _, _, stored_flag, stored_depth, generation = ENTRY.unpack_from(
+            self.memory, offset
+        )
+        if (
+            stored_flag
+            and stored_key != key
+            and generation == self.generation
+            and stored_depth > depth
+        ):
+            return
+        ENTRY.pack_into(
+            self.memory,
+            offset,
+            key,
+            value,
+            encode_move(move),
+            flag,
+            depth,
+            self.generation,
+        )
+
+    def save(self, path):
+        """
+        Saves the table to a file, from which it can be loaded by passing the
+        path of the file when creating a table.
+        """
+        HEADER.pack_into(self.memory, 0, MAGIC, self.size, self.generation)
+        with open(path + ".tmp", "wb") as file:
+            file.write(self.memory)
+        os.replace(path + ".tmp", path)
+
+
+class EvaluationCache:
+    """
+    A fixed size cache of the static evaluations of positions, so that the leaves
+    reached again across iterations and sibling subtrees are not evaluated again.
+    Each position is stored (along with its full hash) in the slot given by the
+    lowest bits of its hash, replacing the position in that slot. The cache is
+    cleared when it is given a position with another evaluator than the positions
+    it holds (see set_evaluator). The numbers of hits and misses are counted.
+    """
+
+    def __init__(self, size=EVALUATION_CACHE_SIZE):
+        self.keys = [None] * size
+        self.values = [0] * size
+        self.mask = size - 1
+        # The evaluator of the positions in the cache
+        self.evaluator = None
+        self.hits = 0
+        self.misses = 0
+
+    def clear(self):
+        self.keys = [None] * len(self.keys)
+
+    def evaluate(self, position: Position):
+        """
+        Returns the evaluation of the position, from the cache if possible.
+        """
+        if position.evaluator is not self.evaluator:
+            self.clear()
+            self.evaluator = position.evaluator
+        index = position.state_hash & self.mask
+        if self.keys[index] == position.state_hash:
+            self.hits += 1
+            return self.values[index]
+        self.misses += 1
+        value = position.evaluate()
+        self.keys[index] = position.state_hash
+        self.values[index] = value
+        return value
+
+    def hit_rate(self):
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
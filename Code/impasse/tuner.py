@@ -0,0 +1,407 @@
+"""
+Texel-style tuning of the evaluation parameters and weights.
+
+Features are extracted from every position of a file of recorded (or self-play)
+games and cached next to it. The parameters are then fitted by minimising the
+mean squared error between the game results and the win probabilities predicted
+by the evaluation. With --evaluator, the weights of the network evaluator (see
+impasse/evaluator.py) are trained the same way instead. Requires numpy.
+
+Usage:
+    python -m impasse.tuner GAMES_FILE [--self-play GAMES] [--evaluator]
+        [--output WEIGHTS_FILE]
+"""
+
+import argparse
+import json
+from multiprocessing import Pool
+import os
+import random
+
+import numpy as np
+
+from impasse.constants import *
+from impasse.evaluator import *
+from impasse.position import *
+from impasse.game_records import *
+
+# Bump whenever Position.evaluation_features changes to invalidate old caches
+FEATURES_VERSION = 1
+
+
+# Game generation
+
+
+def self_play_game(rng: random.Random, epsilon=0.1, max_moves=400):
+    """
+    Plays a game in which each player picks the move with the best evaluation
+    (or a random move with probability epsilon). Returns the moves (in compact
+    notation) and the winner.
+    """
+    position = Position()
+    move_strings = []
+    while position.winner is None and len(move_strings) < max_moves:
+        moves = [
+            (origin, target, tag)
+            for origin, targets in position.all_legal_moves.items()
+            for target, tag in targets.items()
+        ]
+        if rng.random() < epsilon:
+            move = rng.choice(moves)
+        else:
+            sign = 1 if position.turn == WHITE else -1
+            move = max(
+                moves,
+                key=lambda move: sign
+                * position.new_position_after_move(*move).evaluate(),
+            )
+        move_strings.append(move_to_string(move[0], move[1]))
+        position = position.new_position_after_move(*move)
+    return move_strings, position.winner
+
+
+def write_self_play_games(path, games, seed=0):
+    """
+    Appends the records of a number of self-play games to a file.
+    """
+    rng = random.Random(seed)
+    with open(path, "a") as file:
+        for _ in range(games):
+            file.write(game_to_string(*self_play_game(rng)) + "\n")
+
+
+# Feature extraction
+
+
+def game_features(line):
+    """
+    Returns the evaluation features of all the non-terminal positions of a game
+    along with the result of the game (1 if WHITE won, 0 if BLACK won). Unfinished
+    games yield no positions.
+    """
+    move_strings, winner = parse_game(line)
+    if winner is None:
+        return [], None
+    features = [position.evaluation_features() for position, _ in replay(move_strings)]
+    return features, 1 if winner == WHITE else 0
+
+
+def extract_features(path, processes=None):
+    """
+    Extracts the features of all positions in a file of game records in parallel.
+    Returns a matrix with one row of features per position and the vector of the
+    corresponding game results.
+    """
+    features, results = [], []
+    with open(path) as file, Pool(processes) as pool:
+        lines = (line for line in file if line.strip() and not line.startswith("#"))
+        for game, result in pool.imap(game_features, lines, chunksize=64):
+            features.extend(game)
+            results.extend([result] * len(game))
+    return (
+        np.array(features, dtype=np.float64).reshape(-1, 6),
+        np.array(results, dtype=np.float64),
+    )
+
+
+def load_features(path, processes=None):
+    """
+    Returns the features and results of a file of game records, extracting them
+    only if there is no up to date cache for the file.
+    """
+    cache_path = path + ".features.npz"
+    stat = os.stat(path)
+    signature = np.array([FEATURES_VERSION, stat.st_size, stat.st_mtime_ns])
+    if os.path.exists(cache_path):
+        cache = np.load(cache_path)
+        if np.array_equal(cache["signature"], signature):
+            return cache["features"], cache["results"]
+    features, results = extract_features(path, processes)
+    np.savez(cache_path, signature=signature, features=features, results=results)
+    return features, results
+
+
+# Fitting
+
+
+def current_parameters():
+    """
+    Returns the parameters and weights currently used by Position.evaluate.
+    """
+    return np.array(
+        [globals()[name] for name in EVALUATION_WEIGHTS_NAMES], dtype=np.float64
+    )
+
+
+# Indices of the parameters which are maximum path scores (used as integers). They
+# are not fitted: Position.evaluate scores each path its maximum minus its length,
+# so only a maximum above the length of every path keeps more paths scoring more
+# (and the fit would otherwise trade mobility for the other terms).
+PATHS_MAX_INDICES = [
+    i for i, name in enumerate(EVALUATION_WEIGHTS_NAMES) if name.endswith("_PATHS_MAX")
+]
+# Indices of the weights of the path scores
+PATHS_WEIGHT_INDICES = [
+    i
+    for i, name in enumerate(EVALUATION_WEIGHTS_NAMES)
+    if name.endswith("_PATHS_WEIGHT")
+]
+
+
+def clip_parameters(parameters):
+    """
+    Returns the parameters with the weights of the path scores kept at 0 or more,
+    so that the evaluation never decreases with the number of paths.
+    """
+    parameters = parameters.copy()
+    parameters[PATHS_WEIGHT_INDICES] = np.maximum(parameters[PATHS_WEIGHT_INDICES], 0)
+    return parameters
+
+
+def evaluations_and_gradients(features, parameters):
+    """
+    Returns the evaluation of each position as computed by Position.evaluate, along
+    with its gradient with respect to the parameters (ordered as in
+    EVALUATION_WEIGHTS_NAMES).
+    """
+    dpm, spm, ccw, dpw, spw, dw = parameters
+    checkers, doubles, d_paths, d_steps, s_paths, s_steps = features.T
+    d_score = dpm * d_paths - d_steps
+    s_score = spm * s_paths - s_steps
+    evaluations = ccw * checkers + dw * doubles + dpw * d_score + spw * s_score
+    gradients = np.stack(
+        [dpw * d_paths, spw * s_paths, checkers, d_score, s_score, doubles], axis=1
+    )
+    return evaluations, gradients
+
+
+def loss(evaluations, results, scaling):
+    return np.mean((results - 1 / (1 + np.exp(-scaling * evaluations))) ** 2)
+
+
+def fit_scaling(evaluations, results):
+    """
+    Finds the scaling constant K for which the win probabilities 1 / (1 + e^(-K * eval))
+    best fit the results, using a golden section search on a logarithmic scale.
+    """
+    low, high = np.log(1e-5), np.log(1.0)
+    ratio = (np.sqrt(5) - 1) / 2
+    for _ in range(50):
+        a, b = high - ratio * (high - low), low + ratio * (high - low)
+        if loss(evaluations, results, np.exp(a)) < loss(
+            evaluations, results, np.exp(b)
+        ):
+            high = b
+        else:
+            low = a
+    return np.exp((low + high) / 2)
+
+
+def tune(features, results, iterations=2000, learning_rate=0.01):
+    """
+    Fits the evaluation parameters with Adam, starting from the current ones. The
+    scaling constant is fitted once for the current parameters and then kept fixed,
+    so that the tuned evaluation stays on the same scale. The maximum path scores
+    are kept at their current values (see PATHS_MAX_INDICES) and the weights of
+    the path scores at 0 or more. Returns the tuned parameters along with the loss
+    before and after tuning.
+    """
+    parameters = current_parameters()
+    steps = learning_rate * np.maximum(np.abs(parameters), 1)
+    steps[PATHS_MAX_INDICES] = 0
+    evaluations, _ = evaluations_and_gradients(features, parameters)
+    scaling = fit_scaling(evaluations, results)
+    initial_loss = loss(evaluations, results, scaling)
+    m, v = np.zeros_like(parameters), np.zeros_like(parameters)
+    beta1, beta2 = 0.9, 0.999
+    for t in range(1, iterations + 1):
+        evaluations, gradients = evaluations_and_gradients(features, parameters)
+        probabilities = 1 / (1 + np.exp(-scaling * evaluations))
+        errors = (probabilities - results) * probabilities * (1 - probabilities)
+        gradient = 2 * scaling * (errors @ gradients) / len(results)
+        m = beta1 * m + (1 - beta1) * gradient
+        v = beta2 * v + (1 - beta2) * gradient**2
+        m_hat, v_hat = m / (1 - beta1**t), v / (1 - beta2**t)
+        parameters = clip_parameters(
+            parameters - steps * m_hat / (np.sqrt(v_hat) + 1e-12)
+        )
+    evaluations, _ = evaluations_and_gradients(features, parameters)
+    return parameters, initial_loss, loss(evaluations, results, scaling)
+
+
+def save_weights(parameters, path=EVALUATION_WEIGHTS_FILE):
+    """
+    Saves the tuned parameters to a weights file loaded by position_constants.py
+    (with the maximum path scores as integers).
+    """
+    weights = {
+        name: int(value) if i in PATHS_MAX_INDICES else round(float(value), 3)
+        for i, (name, value) in enumerate(zip(EVALUATION_WEIGHTS_NAMES, parameters))
+    }
+    with open(path, "w") as file:
+        json.dump(weights, file, indent=4)
+
+
+# Network evaluator
+
+
+def game_inputs(line):
+    """
+    Returns the active features of both perspectives (see feature_indices) of all
+    the non-terminal positions of a game, in the same order as game_features.
+    """
+    move_strings, winner = parse_game(line)
+    if winner is None:
+        return []
+    return [feature_indices(position.state) for position, _ in replay(move_strings)]
+
+
+def extract_inputs(path, processes=None):
+    """
+    Returns the inputs of the network for all positions in a file of game records:
+    a matrix of features (with one row per position) for each perspective.
+    """
+    rows = []
+    with open(path) as file, Pool(processes) as pool:
+        lines = (line for line in file if line.strip() and not line.startswith("#"))
+        for game in pool.imap(game_inputs, lines, chunksize=64):
+            rows.extend(game)
+    inputs = np.zeros((2, len(rows), FEATURES), dtype=np.uint8)
+    for row, perspectives in enumerate(rows):
+        for perspective, indices in enumerate(perspectives):
+            inputs[perspective, row, indices] = 1
+    return inputs
+
+
+def network_outputs(inputs, hidden_weights, hidden_biases, output_weights):
+    """
+    Returns the outputs of the network (the evaluations multiplied by the scaling
+    constant), along with the hidden layer of each perspective before clipping.
+    """
+    hidden = inputs @ hidden_weights + hidden_biases
+    clipped = np.clip(hidden, 0, 1)
+    return (clipped[0] - clipped[1]) @ output_weights, hidden
+
+
+def train_evaluator(
+    inputs, results, scaling, epochs=50, batch_size=1024, learning_rate=0.001, seed=0
+):
+    """
+    Trains the network evaluator with Adam, fitting the win probabilities
+    1 / (1 + e^(-K * eval)) to the results for the scaling constant K of the
+    current evaluation, so that the network evaluates on the same scale. Returns
+    the quantised evaluator along with the loss before and after training.
+    """
+    rng = np.random.default_rng(seed)
+    parameters = [
+        rng.normal(0, 0.1, (FEATURES, HIDDEN_SIZE)),
+        np.full(HIDDEN_SIZE, 0.5),
+        rng.normal(0, 0.1, HIDDEN_SIZE),
+    ]
+    moments = [(np.zeros_like(p), np.zeros_like(p)) for p in parameters]
+    beta1, beta2 = 0.9, 0.999
+
+    def loss_of(parameters):
+        outputs = np.concatenate(
+            [
+                network_outputs(
+                    inputs[:, start : start + batch_size].astype(np.float64),
+                    *parameters,
+                )[0]
+                for start in range(0, len(results), batch_size)
+            ]
+        )
+        return loss(outputs / scaling, results, scaling)
+
+    initial_loss = loss_of(parameters)
+    t = 0
+    for _ in range(epochs):
+        order = rng.permutation(len(results))
+        for start in range(0, len(results), batch_size):
+            batch = order[start : start + batch_size]
+            batch_inputs = inputs[:, batch].astype(np.float64)
+            outputs, hidden = network_outputs(batch_inputs, *parameters)
+            probabilities = 1 / (1 + np.exp(-outputs))
+            errors = (
+                2
+                * (probabilities - results[batch])
+                * probabilities
+                * (1 - probabilities)
+                / len(batch)
+            )
+            clipped = np.clip(hidden, 0, 1)
+            hidden_errors = (
+                errors[:, None]
+                * parameters[2]
+                * ((hidden > 0) & (hidden < 1))
+                * np.array([1, -1])[:, None, None]
+            )
+            gradients = [
+                np.einsum("pnf,pnh->fh", batch_inputs, hidden_errors),
+                hidden_errors.sum(axis=(0, 1)),
+                errors @ (clipped[0] - clipped[1]),
+            ]
+            t += 1
+            for parameter, gradient, (m, v) in zip(parameters, gradients, moments):
+                m *= beta1
+                m += (1 - beta1) * gradient
+                v *= beta2
+                v += (1 - beta2) * gradient**2
+                m_hat, v_hat = m / (1 - beta1**t), v / (1 - beta2**t)
+                parameter -= learning_rate * m_hat / (np.sqrt(v_hat) + 1e-12)
+    hidden_weights, hidden_biases, output_weights = parameters
+    return (
+        Evaluator.from_float(hidden_weights, hidden_biases, output_weights / scaling),
+        initial_loss,
+        loss_of(parameters),
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Tune the evaluation weights.")
+    parser.add_argument("games", help="file of game records")
+    parser.add_argument(
+        "--self-play",
+        type=int,
+        default=0,
+        metavar="GAMES",
+        help="number of self-play games to append to the file before tuning",
+    )
+    parser.add_argument(
+        "--evaluator",
+        action="store_true",
+        help="train the network evaluator instead of the evaluation weights",
+    )
+    parser.add_argument(
+        "--output",
+        default=None,
+        help="weights file (by default the one loaded at startup)",
+    )
+    parser.add_argument("--iterations", type=int, default=2000)
+    parser.add_argument("--epochs", type=int, default=50)
+    parser.add_argument("--processes", type=int, default=None)
+    args = parser.parse_args()
+
+    if args.self_play:
+        write_self_play_games(args.games, args.self_play)
+    features, results = load_features(args.games, args.processes)
+    print(f"Positions: {len(results)}")
+    if args.evaluator:
+        evaluations, _ = evaluations_and_gradients(features, current_parameters())
+        scaling = fit_scaling(evaluations, results)
+        inputs = extract_inputs(args.games, args.processes)
+        evaluator, initial_loss, final_loss = train_evaluator(
+            inputs, results, scaling, args.epochs
+        )
+        print(f"Loss: {initial_loss:.6f} -> {final_loss:.6f}")
+        evaluator.save(args.output or EVALUATOR_WEIGHTS_FILE)
+        return
+    parameters, initial_loss, final_loss = tune(features, results, args.iterations)
+    print(f"Loss: {initial_loss:.6f} -> {final_loss:.6f}")
+    for name, value in zip(EVALUATION_WEIGHTS_NAMES, parameters):
+        print(f"{name} = {value:.3f}")
+    save_weights(parameters, args.output or EVALUATION_WEIGHTS_FILE)
+
+
+if __name__ == "__main__":
+    main()
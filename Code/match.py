@@ -0,0 +1,66 @@
+"""
+Plays a match between the alpha-beta AI and the Monte Carlo tree search AI, with
+the same time per move, to compare their strength.
+
+Usage:
+    python match.py [--games N] [--milliseconds MS] [--processes P]
+"""
+
+import argparse
+import contextlib
+import io
+
+from impasse.ai import AI
+from impasse.constants import *
+from impasse.mcts import MCTSAI
+from impasse.position import Position
+
+
+def play_game(players, milliseconds):
+    """
+    Plays a game between two players (indexed by color). Returns the winner.
+    """
+    position = Position()
+    while position.winner is None:
+        player = players[position.turn]
+        # Keep the output of the players quiet
+        with contextlib.redirect_stdout(io.StringIO()):
+            if isinstance(player, AI):
+                _, _, move = player.iterative_deepening(
+                    position,
+                    milliseconds_per_move=milliseconds,
+                    max_milliseconds_per_move=milliseconds,
+                    min_search_depth=0,
+                )
+            else:
+                *move, _ = player.suggested_move(position)
+        position = position.new_position_after_move(*move)
+    return position.winner
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Play alpha-beta against MCTS.")
+    parser.add_argument("--games", type=int, default=10)
+    parser.add_argument("--milliseconds", type=int, default=1000, metavar="MS")
+    parser.add_argument(
+        "--processes", type=int, default=1, help="processes used by the MCTS AI"
+    )
+    args = parser.parse_args()
+
+    wins = {"alpha-beta": 0, "mcts": 0}
+    for game in range(args.games):
+        # Alternate colors
+        mcts_color = WHITE if game % 2 else BLACK
+        mcts = MCTSAI(mcts_color, args.milliseconds, args.processes, seed=game)
+        ai_color = OPPOSITE_COLOR[mcts_color]
+        players = {mcts_color: mcts, ai_color: AI(ai_color)}
+        try:
+            winner = play_game(players, args.milliseconds)
+        finally:
+            mcts.close()
+        wins["mcts" if winner == mcts_color else "alpha-beta"] += 1
+        print(f"Game {game + 1}: alpha-beta {wins['alpha-beta']}, mcts {wins['mcts']}")
+
+
+if __name__ == "__main__":
+    main()
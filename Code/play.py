@@ -11,15 +11,16 @@ def get_cell_from_mouse(pos):
     return (pos[0] // SQUARE_SIZE, (HEIGHT - pos[1]) // SQUARE_SIZE)
 
 
-def play(secs=None, ai_player=None):
+def play(secs=None, ai_player=None, tt_path=None):
     """
-    Main loop controlling the gameplay.
+    Main loop controlling the gameplay. If tt_path is given, the transposition
+    table of the AI player is loaded from and saved to that file.
     """
     WINDOW = pg.display.set_mode((WIDTH + INFO_WIDTH, HEIGHT))
     pg.display.set_caption("IMPASSE")
     run = True
     clock = pg.time.Clock()
-    game = impasse.GUI(WINDOW, secs, ai_player)
+    game = impasse.GUI(WINDOW, secs, ai_player, tt_path)
     pg.time.set_timer(SEC, 1000)
 
     while run:
@@ -49,6 +50,7 @@ def play(secs=None, ai_player=None):
 
         game.board_update()
 
+    game.save_transposition_table()
     pg.quit()
 
 
@@ -0,0 +1,9 @@
+"""
+Runs the game server, hosting games against the AI for clients connecting over TCP
+(see impasse.server for the protocol).
+"""
+
+from impasse.server import main
+
+if __name__ == "__main__":
+    main()